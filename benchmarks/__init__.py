@@ -0,0 +1 @@
+"""Benchmarks for the hot paths of the rn2md tool."""
@@ -0,0 +1,43 @@
+"""Compares parsing common date expressions with and without the fast path.
+
+Usage:
+    python -m benchmarks.date_parsing [PARSES]
+"""
+import itertools
+import sys
+import timeit
+from unittest import mock
+
+from rn2md import util
+
+DATE_STRS = [
+    'today', 'yesterday', 'this week', 'last week', '2018-03-21',
+    'Mar 21, 2018', 'Wed Mar 21, 2018', 'week of 2018-03-21',
+]
+
+
+def main():
+    """Times parsing the common date expressions many times over."""
+    num_parses = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    date_strs = list(itertools.islice(
+        itertools.cycle(DATE_STRS), num_parses))
+
+    def parse_all():
+        for date_str in date_strs:
+            util.parse_date_range(date_str)
+
+    fast_seconds = min(timeit.repeat(parse_all, number=1, repeat=3))
+    with mock.patch.object(util, '_parse_common_date', return_value=None):
+        cached_seconds = min(timeit.repeat(parse_all, number=1, repeat=3))
+        # Undoes the caching, to construct a Calendar for every parse.
+        uncached_calendar = util._calendar.__wrapped__  # pylint: disable=W0212
+        with mock.patch.object(util, '_calendar', uncached_calendar):
+            slow_seconds = min(timeit.repeat(parse_all, number=1, repeat=3))
+    print(f'{num_parses} parses')
+    print(f'{"new Calendar per parse":>24}: {slow_seconds:.3f}s')
+    print(f'{"shared Calendar":>24}: {cached_seconds:.3f}s')
+    print(f'{"fast path":>24}: {fast_seconds:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
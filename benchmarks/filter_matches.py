@@ -0,0 +1,47 @@
+"""Shows that the formatters scale linearly on pathological lines.
+
+Lines such as pasted logs can contain thousands of underscores, slashes or
+dashes. Each of them is a candidate match which has to be checked against the
+line's links and backticks, so the cost per candidate must not depend on the
+length of the line.
+
+Usage:
+    python -m benchmarks.filter_matches
+"""
+import timeit
+
+from rn2md import formatters
+
+_PATHOLOGICAL_LINES = {
+    'underscores': 'log_line_{} `var_{}` [x_{} ""http://y/z_{}""] ',
+    'slashes': 'a//b `c//d` //{}// [""http://x/{}""] {} {} ',
+    'dashes': 'a--b `c--d` --{}-- [e ""f--{}""] {} {} ',
+}
+
+
+def main():
+    """Times formatters on increasingly long pathological lines."""
+    stages = {
+        'underscores': formatters.format_inner_underscores,
+        'slashes': formatters.format_italic_text,
+        'dashes': formatters.format_strikethrough_text,
+    }
+    for name, template in _PATHOLOGICAL_LINES.items():
+        for make_formatter in (
+                stages[name], formatters.format_rednotebook_as_markdown):
+            previous_seconds = None
+            for repeats in (1000, 2000, 4000, 8000):
+                line = ''.join(
+                    template.format(*[i] * 4) for i in range(repeats))
+                formatter = make_formatter()
+                seconds = min(timeit.repeat(
+                    lambda: formatter.send(line), number=1, repeat=3))
+                growth = (f'x{seconds / previous_seconds:.1f}'
+                          if previous_seconds else '')
+                print(f'{name:>11} {make_formatter.__name__:>30} '
+                      f'{len(line):>7} chars: {seconds:.4f}s {growth}')
+                previous_seconds = seconds
+
+
+if __name__ == '__main__':
+    main()
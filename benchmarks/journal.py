@@ -0,0 +1,110 @@
+"""Generates synthetic RedNotebook journals for benchmarking."""
+import calendar
+import os
+import random
+
+import yaml
+
+_WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+    'tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam '
+    'quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo'
+).split()
+# Turns a word into each kind of inline markup, some using a second word.
+_INLINE_MARKUP = {
+    'links': lambda word, _: f'[{word} ""http://example.com/{word}_page""]',
+    'images': lambda word, _: f'[""http://example.com/{word}.png""]',
+    'italics': lambda word, _: f'//{word}//',
+    'strikethroughs': lambda word, _: f'--{word}--',
+    'code': lambda word, other: f'``{word}_{other}``',
+    'underscores': lambda word, other: f'{word}_{other}',
+}
+# The kinds of RedNotebook markup the generated entries can contain.
+MARKUP_KINDS = (*_INLINE_MARKUP, 'lists', 'headers')
+
+
+def write_journal(data_path, years=10, end_year=2020, entry_lines=20,
+                  markup_density=0.2, seed=0, line_words=12, densities=None):
+    """Writes RedNotebook-styled YYYY-MM.txt month files into data_path.
+
+    Args:
+        data_path: directory to write the month files into.
+        years: number of years of daily entries to generate.
+        end_year: the last year to generate entries for.
+        entry_lines: number of lines in each daily entry.
+        markup_density: probability that a line contains RedNotebook markup
+            (links, lists, code, italics, strikethroughs and underscores).
+        seed: seed for the random number generator, for reproducible output.
+        line_words: number of words in each line.
+        densities: optional mapping of MARKUP_KINDS to the probability that a
+            line (or for headers, an entry) contains that kind of markup.
+            Kinds which are not given are spread over markup_density.
+
+    Returns:
+        the number of month files written.
+    """
+    rng = random.Random(seed)
+    densities = _markup_densities(markup_density, densities)
+    os.makedirs(data_path, exist_ok=True)
+    num_months = 0
+    for year in range(end_year - years + 1, end_year + 1):
+        for month in range(1, 13):
+            _, num_days = calendar.monthrange(year, month)
+            month_content = {
+                day: {'text': _make_entry(
+                    rng, entry_lines, line_words, densities)}
+                for day in range(1, num_days + 1)
+            }
+            month_path = os.path.join(data_path, f'{year:04d}-{month:02d}.txt')
+            with open(month_path, 'w', encoding='utf-8') as month_file:
+                yaml.safe_dump(month_content, month_file, allow_unicode=True)
+            num_months += 1
+    return num_months
+
+
+def make_line(rng, markup_density=0.2, num_words=12, densities=None):
+    """Returns a single line of RedNotebook-styled text.
+
+    Args:
+        rng: the random.Random instance to generate the line with.
+        markup_density: probability that the line contains inline markup,
+            and, separately, that it is a list item.
+        num_words: number of words in the line.
+        densities: optional mapping of MARKUP_KINDS to their probabilities,
+            as returned by _markup_densities.
+    """
+    if densities is None:
+        densities = _markup_densities(markup_density)
+    words = [rng.choice(_WORDS) for _ in range(num_words)]
+    for kind, make_markup in _INLINE_MARKUP.items():
+        if rng.random() < densities[kind]:
+            i = rng.randrange(num_words)
+            words[i] = make_markup(words[i], rng.choice(_WORDS))
+    if rng.random() < densities['lists']:
+        words.insert(0, rng.choice(['+', '-', ' +', ' -']))
+    return ' '.join(words)
+
+
+def _markup_densities(markup_density, densities=None):
+    """Returns the probability of every kind of markup.
+
+    The inline kinds share markup_density, so that it stays the probability
+    of a line containing any inline markup. Lists and headers get all of it.
+    """
+    inline_density = markup_density / len(_INLINE_MARKUP)
+    return {
+        **{kind: inline_density for kind in _INLINE_MARKUP},
+        'lists': markup_density,
+        'headers': markup_density,
+        **(densities or {}),
+    }
+
+
+def _make_entry(rng, entry_lines, line_words, densities):
+    lines = [
+        make_line(rng, num_words=line_words, densities=densities)
+        for _ in range(entry_lines)
+    ]
+    if rng.random() < densities['headers']:
+        lines.insert(0, f'=={rng.choice(_WORDS).title()}==')
+    return '\n'.join(lines)
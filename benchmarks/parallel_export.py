@@ -0,0 +1,49 @@
+"""Shows how exporting an entire journal scales with the number of processes.
+
+Usage:
+    python -m benchmarks.parallel_export [YEARS]
+"""
+import datetime as dt
+import os
+import sys
+import tempfile
+import timeit
+
+from rn2md import __main__ as rn2md_main
+
+from . import journal
+
+
+def main():
+    """Times serial and parallel exports of a synthetic journal."""
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as data_path:
+        journal.write_journal(data_path, years=years, end_year=2020)
+        start = dt.date(2020 - years + 1, 1, 1)
+        date_range = [
+            start + dt.timedelta(days=i)
+            for i in range((dt.date(2021, 1, 1) - start).days)
+        ]
+
+        def serial_export():
+            red_notebook = rn2md_main.RedNotebook.from_file(data_path)
+            return list(red_notebook.to_markdown(
+                date_range[0], date_range[-1]))
+
+        expected_entries = serial_export()
+        seconds = min(timeit.repeat(serial_export, number=1, repeat=3))
+        print(f'    serial: {seconds:.3f}s')
+        for jobs in sorted({2, 4, os.cpu_count() or 1}):
+
+            def parallel_export(jobs=jobs):
+                return list(rn2md_main.to_markdown_in_parallel(
+                    data_path, date_range, jobs))
+
+            if parallel_export() != expected_entries:
+                raise AssertionError(f'--jobs {jobs} output differs')
+            seconds = min(timeit.repeat(parallel_export, number=1, repeat=3))
+            print(f'--jobs {jobs:>2}: {seconds:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
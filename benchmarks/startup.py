@@ -0,0 +1,62 @@
+"""Checks that importing rn2md stays within a startup time budget.
+
+Imports rn2md in fresh interpreters with `python -X importtime`, and fails
+when the import takes longer than the budget or pulls in a dependency which
+should only be imported once it is needed.
+
+Import times vary a lot between machines, so there is no default budget:
+measure the import on the machine first, e.g. on the main branch, and pass
+the budget the change should stay within.
+
+Usage:
+    python -m benchmarks.startup BUDGET_MS
+"""
+import subprocess
+import sys
+
+REPEAT = 5
+DEFERRED_MODULES = (
+    'asyncio',
+    'calendar',
+    'concurrent.futures',
+    'defaultlist',
+    'isoweek',
+    'logging',
+    'parsedatetime',
+    'sqlite3',
+    'yaml',
+)
+
+
+def measure_import():
+    """Returns the microseconds it took to import rn2md, and the modules."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import rn2md.__main__'],
+        capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        unused_self_us, cumulative_us, module = line[12:].split('|')
+        modules[module.strip()] = int(cumulative_us)
+    return modules['rn2md.__main__'], modules
+
+
+def main():
+    """Prints the import time of rn2md, and exits non-zero if over budget."""
+    if len(sys.argv) != 2:
+        sys.exit('usage: python -m benchmarks.startup BUDGET_MS')
+    budget_ms = float(sys.argv[1])
+    measurements = [measure_import() for _ in range(REPEAT)]
+    import_us, modules = min(measurements, key=lambda m: m[0])
+    deferred = [m for m in DEFERRED_MODULES if m in modules]
+    print(f'import rn2md.__main__: {import_us / 1000:.1f}ms '
+          f'(budget: {budget_ms:.1f}ms)')
+    if deferred:
+        sys.exit(f'imported eagerly: {", ".join(deferred)}')
+    if import_us > budget_ms * 1000:
+        sys.exit('over the startup budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Times the hot paths of rn2md on a synthetic journal, and records them.
+
+Writes a synthetic journal into a temporary directory, then times:
+    - loading it with storage.load_rednotebook_entries,
+    - every formatter in rn2md.formatters, on all of the journal's lines,
+    - RedNotebook.to_markdown on all of the journal's entries,
+    - full runs of the rn2md command, each in a fresh interpreter.
+
+The results are written as JSON, and runs with the same journal options are
+comparable: pass an earlier result file with --compare to see the change.
+
+Usage:
+    python -m benchmarks.suite [--years N] [--density KIND=P] [-o FILE]
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from rn2md import __main__ as rn2md_main
+from rn2md import formatters, storage
+
+from . import journal
+
+LINE_FORMATTERS = (
+    formatters.format_inner_underscores,
+    formatters.format_links,
+    formatters.format_images,
+    formatters.format_headers,
+    formatters.format_code_blocks,
+    formatters.format_italic_text,
+    formatters.format_strikethrough_text,
+    formatters.format_lists,
+    formatters.format_rednotebook_as_markdown_in_stages,
+    formatters.format_rednotebook_as_markdown,
+)
+MAIN_DATE_STRS = ('Dec 21, 2020', 'week of Dec 21, 2020')
+
+
+def parse_args(argv):
+    """Returns the options of the suite given by argv."""
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.suite',
+        description='Times the hot paths of rn2md on a synthetic journal.')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--entry-lines', type=int, default=20)
+    parser.add_argument('--line-words', type=int, default=12)
+    parser.add_argument('--markup-density', type=float, default=0.2)
+    parser.add_argument(
+        '--density', action='append', default=[], metavar='KIND=P',
+        help=f'probability of one kind of markup, one of: '
+             f'{", ".join(journal.MARKUP_KINDS)}')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        '-o', '--output', metavar='FILE', help='file to write results to')
+    parser.add_argument(
+        '--compare', metavar='FILE', help='earlier results to compare with')
+    args = parser.parse_args(argv)
+    densities = {}
+    for density in args.density:
+        kind, _, probability = density.partition('=')
+        if kind not in journal.MARKUP_KINDS:
+            parser.error(f'unknown markup kind: {kind!r}')
+        densities[kind] = float(probability)
+    args.density = densities
+    return args
+
+
+def run_suite(data_path, repeat=3):
+    """Returns the timings of every hot path on the journal in data_path."""
+    results = {}
+
+    def record(name, func, items):
+        seconds = timeit.repeat(func, number=1, repeat=repeat)
+        results[name] = {
+            'seconds': min(seconds),
+            'mean_seconds': sum(seconds) / len(seconds),
+            'items': items,
+        }
+
+    entries = storage.load_rednotebook_entries(data_path)
+    record('storage.load_rednotebook_entries',
+           lambda: storage.load_rednotebook_entries(data_path), len(entries))
+
+    lines = [line for entry in entries.values() for line in entry.split('\n')]
+    for make_formatter in LINE_FORMATTERS:
+        def format_lines(make_formatter=make_formatter):
+            formatter = make_formatter()
+            for line in lines:
+                formatter.send(line)
+        record(f'formatters.{make_formatter.__name__}', format_lines,
+               len(lines))
+    record('formatters.format_entries',
+           lambda: list(formatters.format_entries(entries.values())),
+           len(entries))
+
+    red_notebook = rn2md_main.RedNotebook(entries)
+    record('RedNotebook.to_markdown',
+           lambda: list(red_notebook.to_markdown()), len(entries))
+
+    with tempfile.TemporaryDirectory() as home_path:
+        with open(os.path.join(home_path, '.rn2mdrc'), 'w',
+                  encoding='utf-8') as config_file:
+            config_file.write(
+                f'[DEFAULT]\ndata path={data_path}\ncache path=\n')
+        env = {**os.environ, 'HOME': home_path}
+        # Runs the same rn2md as the rest of the suite, even if not installed.
+        package_root = os.path.dirname(os.path.dirname(rn2md_main.__file__))
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, [package_root, env.get('PYTHONPATH')]))
+        for date_str in MAIN_DATE_STRS:
+            command = [
+                sys.executable, '-m', 'rn2md', '-o', os.devnull, date_str]
+            record(f'main({date_str!r})',
+                   lambda command=command: subprocess.run(
+                       command, env=env, check=True), 1)
+    return results
+
+
+def main():
+    """Runs the suite, then prints and optionally saves the results."""
+    args = parse_args(sys.argv[1:])
+    journal_options = {
+        'years': args.years,
+        'end_year': 2020,
+        'entry_lines': args.entry_lines,
+        'line_words': args.line_words,
+        'markup_density': args.markup_density,
+        'densities': args.density,
+        'seed': args.seed,
+    }
+    with tempfile.TemporaryDirectory() as data_path:
+        journal.write_journal(data_path, **journal_options)
+        results = run_suite(data_path, args.repeat)
+    report = {
+        'created': dt.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'yaml_backend': storage.yaml_backend(),
+        'journal': journal_options,
+        'results': results,
+    }
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            baseline_report = json.load(baseline_file)
+        if baseline_report['journal'] != journal_options:
+            print('warning: the baseline used different journal options')
+        baseline = baseline_report['results']
+    for name, result in results.items():
+        change = ''
+        if name in baseline:
+            ratio = result['seconds'] / baseline[name]['seconds']
+            change = f' {ratio - 1:+.1%}'
+        print(f'{name:<58} {result["seconds"]:9.4f}s{change}')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+            output_file.write('\n')
+
+
+if __name__ == '__main__':
+    main()
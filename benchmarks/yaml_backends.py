@@ -0,0 +1,37 @@
+"""Compares the libyaml and pure-Python YAML backends of rn2md.storage.
+
+Usage:
+    python -m benchmarks.yaml_backends [YEARS]
+"""
+import sys
+import tempfile
+import timeit
+from unittest import mock
+
+import yaml
+
+from rn2md import storage
+
+from . import journal
+
+
+def main():
+    """Times loading a synthetic journal with each available YAML backend."""
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    backends = {'python': yaml.SafeLoader}
+    if hasattr(yaml, 'CSafeLoader'):
+        backends['libyaml'] = yaml.CSafeLoader
+    with tempfile.TemporaryDirectory() as data_path:
+        num_months = journal.write_journal(data_path, years=years)
+        print(f'{num_months} month files, default backend: '
+              f'{storage.yaml_backend()}')
+        for name, loader in backends.items():
+            with mock.patch.object(storage, '_YAML_LOADER', loader):
+                seconds = min(timeit.repeat(
+                    lambda: storage.load_rednotebook_entries(data_path),
+                    number=1, repeat=3))
+            print(f'{name:>8}: {seconds:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
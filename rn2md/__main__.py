@@ -1,42 +1,413 @@
 """Entry point for the rn2md tool."""
 
+import argparse
+import contextlib
 import dataclasses
 import datetime as dt
+import json
 import sys
+from collections.abc import Mapping
 
-from . import config, formatters, storage, util
+from . import config, export, formatters, profiling, storage, util, watch
 
-ENTRY_SEP = '\n\n\n'
+ENTRY_SEP = formatters.ENTRY_SEP
 
 
 @dataclasses.dataclass
 class RedNotebook:
-    entries: dict[dt.date, str]
+    entries: Mapping[dt.date, str]
+    # Maps every #tag to the sorted dates of the entries using it, found from
+    # the entries when not given.
+    tags: Mapping[str, list[dt.date]] = None
 
     @classmethod
-    def from_file(cls, data_path):
-        return cls(storage.load_rednotebook_entries(data_path))
+    def from_file(cls, data_path, date_range=None, cache=None):
+        """Loads entries from data_path, optionally limited to date_range."""
+        tags = {}
+        entries = storage.CompactEntries.from_months(
+            storage.iter_month_entries(data_path, date_range, cache, tags))
+        return cls(entries, tags)
 
-    def to_markdown(self, date_range):
-        """Yields the specified RedNotebook entries in Markdown format."""
-        for date in date_range:
-            if date in self.entries:
-                rn_lines = self.entries[date].split('\n')
-                formatter = formatters.format_rednotebook_as_markdown()
-                md_lines = [formatter.send(line.rstrip()) for line in rn_lines]
-                yield '\n'.join(md_lines)
+    def __post_init__(self):
+        if self.tags is None:
+            self.tags = {}
+            for date, entry in sorted(self.entries.items()):
+                for tag in storage.extract_tags(entry):
+                    self.tags.setdefault(tag, []).append(date)
+        if not isinstance(self.entries, storage.CompactEntries):
+            self.entries = storage.CompactEntries(self.entries)
+
+    def range(self, start=None, end=None):
+        """Yields the (date, entry) pairs from start to end, inclusive.
+
+        Either bound may be None to leave that side of the range open.
+        """
+        return self.entries.range(start, end)
+
+    def to_markdown(self, start=None, end=None, tag=''):
+        """Yields the entries from start to end, inclusive, in Markdown format.
+
+        Either bound may be None to leave that side of the range open, as in
+        `range`. When tag is given, only the entries using the #tag are
+        formatted.
+        """
+        rn_entries = self.range(start, end)
+        if tag:
+            tagged_dates = set(self.tags.get(tag.lstrip('#').lower(), ()))
+            rn_entries = (
+                (date, entry) for date, entry in rn_entries
+                if date in tagged_dates)
+        yield from formatters.format_entries(entry for _, entry in rn_entries)
 
 
 def main():
-    """Prints RedNotebook entries in markdown syntax."""
+    """Prints RedNotebook entries in markdown syntax, or runs a command."""
     options, remaining_argv = config.Options.from_argv(sys.argv)
+    if remaining_argv and remaining_argv[0] in COMMANDS:
+        command, *command_args = remaining_argv
+        run_command = COMMANDS[command]
+    else:
+        command_args = remaining_argv
+        run_command = watch_markdown if options.watch else print_markdown
+    if options.profile_path:
+        profiling.enable()
+    try:
+        run_command(options, command_args)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if options.profile_path == '-':
+            sys.stderr.write(profiling.format_summary())
+        elif options.profile_path:
+            profiling.write_json(options.profile_path)
+
+
+def print_markdown(options, remaining_argv):
+    """Prints the entries of the date range given by remaining_argv."""
+    date_range = _parse_date_range(options, remaining_argv)
+    if options.jobs > 1:
+        md_entries = to_markdown_in_parallel(
+            options.data_path, date_range, options.jobs, options.tag)
+    else:
+        red_notebook = _load_red_notebook(options, date_range)
+        md_entries = red_notebook.to_markdown(
+            date_range[0], date_range[-1], options.tag)
+    _write_output(options, md_entries)
+
+
+def watch_markdown(options, remaining_argv):
+    """Prints the entries again whenever RedNotebook saves any of them.
+
+    The entries are kept in memory between changes. Only the month files
+    which were saved are loaded again, and only the entries whose text
+    changed are formatted again.
+    """
+    date_range = _parse_date_range(options, remaining_argv)
+    months = {date.replace(day=1) for date in date_range}
+    with watch.MonthFileWatcher(options.data_path) as watcher:
+        month_entries = {
+            month_date: storage.load_month_entries(month_date, month_path)
+            for month_date, month_path in storage.find_month_files(
+                options.data_path, date_range)
+        }
+        md_entries = {}
+        while True:
+            rn_entries = [
+                month_entries.get(date.replace(day=1), {}).get(date)
+                for date in date_range
+            ]
+            if options.tag:
+                rn_entries = [
+                    rn_entry for rn_entry in rn_entries if rn_entry and
+                    options.tag in storage.extract_tags(rn_entry)
+                ]
+            md_entries = {
+                rn_entry: (md_entries[rn_entry] if rn_entry in md_entries
+                           else formatters.format_entry(rn_entry))
+                for rn_entry in rn_entries if rn_entry
+            }
+            _write_output(
+                options, (md_entries[rn] for rn in rn_entries if rn))
+            changes = {}
+            while not changes.keys() & months:
+                changes = watcher.wait()
+            for month_date, month_path in changes.items():
+                month_entries[month_date] = (
+                    {} if month_path is None else
+                    storage.load_month_entries(month_date, month_path))
+
+
+def export_markdown(options, command_args):
+    """Mirrors the entries into the directory given by command_args.
+
+    In watch mode, the entries are exported again whenever RedNotebook saves
+    them. Only the month files which were saved are exported again.
+    """
+    if len(command_args) != 1:
+        sys.exit('usage: rn2md export OUTPUT_DIRECTORY')
+    with contextlib.ExitStack() as stack:
+        if options.watch:
+            watcher = stack.enter_context(
+                watch.MonthFileWatcher(options.data_path))
+        while True:
+            written, deleted = export.export_markdown_tree(
+                options.data_path, command_args[0], options.export_layout)
+            print(f'{len(written)} files written, '
+                  f'{len(deleted)} files deleted', flush=True)
+            if not options.watch:
+                break
+            watcher.wait()
+
+
+def batch_markdown(options, command_args):
+    """Prints the entries of many date expressions, loading entries once.
+
+    The date expressions are read from a file, or stdin, either one per line
+    or as a JSON list of strings. Expressions which can not be parsed are
+    reported without stopping the batch.
+    """
+    parser = argparse.ArgumentParser(
+        prog='rn2md batch',
+        description='Prints the entries of many date expressions.')
+    parser.add_argument(
+        'input_path', nargs='?', default='-', metavar='FILE',
+        help='file of date expressions, "-" or omitted to read stdin')
+    parser.add_argument(
+        '--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(command_args)
+    if args.input_path == '-':
+        date_strs = _read_date_strs(sys.stdin)
+    else:
+        with open(args.input_path, encoding='utf-8') as input_file:
+            date_strs = _read_date_strs(input_file)
+
+    results = []
+    for date_str in date_strs:
+        try:
+            date_range = util.parse_date_range(
+                date_str, options.workdays_only)
+        except ValueError as error:
+            results.append({'query': date_str, 'error': str(error)})
+        else:
+            results.append({'query': date_str, 'dates': date_range})
+    red_notebook = _load_red_notebook(options, {
+        date for result in results for date in result.get('dates', [])
+    })
+    for result in results:
+        if 'dates' in result:
+            result['entries'] = list(red_notebook.to_markdown(
+                result['dates'][0], result['dates'][-1], options.tag))
+            result['dates'] = [date.isoformat() for date in result['dates']]
+
+    with _open_output(options) as output_file:
+        if args.json:
+            json.dump(results, output_file, ensure_ascii=False, indent=2)
+            output_file.write('\n')
+            return
+        for result in results:
+            output_file.write(f'==> {result["query"]} <==\n')
+            if 'error' in result:
+                print(f'rn2md: {result["error"]}', file=sys.stderr)
+                output_file.write('\n')
+            else:
+                write_entries(result['entries'], output_file)
+                output_file.write('\n')
+
+
+def _read_date_strs(input_file):
+    """Returns the date expressions read from input_file.
+
+    The input is either a JSON list of strings, or one expression per line.
+    Empty lines are skipped.
+    """
+    content = input_file.read()
+    if content.lstrip().startswith('['):
+        try:
+            date_strs = json.loads(content)
+        except json.JSONDecodeError as error:
+            sys.exit(f'rn2md: JSON input could not be parsed: {error}')
+        if not all(isinstance(date_str, str) for date_str in date_strs):
+            sys.exit('rn2md: JSON input must be a list of strings')
+        return date_strs
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+def search_markdown(options, command_args):
+    """Prints the dates of the entries which use every one of the words.
+
+    The search index is brought up to date first, which only parses the month
+    files that changed since the previous search. With a tag filter, only the
+    entries which also use the tag are found.
+    """
+    parser = argparse.ArgumentParser(
+        prog='rn2md search',
+        description='Prints the dates of entries using all of the words.')
+    parser.add_argument('words', nargs='+', metavar='WORD')
+    parser.add_argument(
+        '--markdown', action='store_true',
+        help='print the matching entries in markdown, not just their dates')
+    args = parser.parse_args(command_args)
+    with _open_cache(options) as cache, _open_search_index(
+            options) as index:
+        index.update(options.data_path, cache)
+        dates = index.search(' '.join(args.words))
+    if args.markdown or options.tag:
+        red_notebook = _load_red_notebook(options, dates)
+    if options.tag:
+        tagged_dates = set(red_notebook.tags.get(options.tag, ()))
+        dates = [date for date in dates if date in tagged_dates]
+    with _open_output(options) as output_file:
+        if not args.markdown:
+            output_file.writelines(f'{date.isoformat()}\n' for date in dates)
+            return
+        for date in dates:
+            output_file.write(f'==> {date.isoformat()} <==\n')
+            write_entries(
+                red_notebook.to_markdown(date, date, options.tag), output_file)
+            output_file.write('\n')
+
+
+def serve_markdown(options, command_args):
+    """Serves the entries over HTTP on localhost until interrupted."""
+    if len(command_args) > 1 or not all(map(str.isdigit, command_args)):
+        sys.exit('usage: rn2md serve [PORT]')
+    # asyncio takes as long to import as the rest of rn2md, so only the
+    # serve command imports it.
+    import asyncio  # pylint: disable=import-outside-toplevel
+    from . import serve  # pylint: disable=import-outside-toplevel
+    port = int(command_args[0]) if command_args else serve.DEFAULT_PORT
+    print(f'Serving markdown on http://{serve.DEFAULT_HOST}:{port}/',
+          flush=True)
+    asyncio.run(serve.serve_markdown(
+        options.data_path, port=port, workdays_only=options.workdays_only))
+
+
+def to_markdown_in_parallel(data_path, date_range, jobs, tag=''):
+    """Yields the same entries as `RedNotebook.to_markdown`, using processes.
+
+    Every month file overlapping date_range is parsed and formatted by one of
+    `jobs` worker processes. The results are yielded in the order of
+    date_range, which must keep the dates of each month together (as sorted
+    date ranges do). When tag is given, only the entries using it are
+    formatted.
+    """
+    dates_by_month = {}
+    for date in date_range:
+        dates_by_month.setdefault(date.replace(day=1), []).append(date)
+    month_paths = dict(storage.find_month_files(data_path, date_range))
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+    month_tasks = [
+        (month_date, month_paths[month_date], dates, tag)
+        for month_date, dates in dates_by_month.items()
+        if month_date in month_paths
+    ]
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        for md_entries in executor.map(_month_to_markdown, month_tasks):
+            yield from md_entries
+
+
+def _month_to_markdown(month_task):
+    """Returns the markdown of a month file's entries on the given dates."""
+    month_date, month_path, dates, tag = month_task
+    entries = storage.load_month_entries(
+        month_date, month_path, dates=set(dates))
+    return list(formatters.format_entries(
+        entries[date] for date in dates if date in entries and (
+            not tag or tag in storage.extract_tags(entries[date]))))
+
+
+def _parse_date_range(options, remaining_argv):
+    """Returns the date range given by remaining_argv, or the default one."""
+    if not remaining_argv:
+        return options.default_date_range
+    return util.parse_date_range(
+        ' '.join(remaining_argv), options.workdays_only)
+
+
+def _load_red_notebook(options, date_range):
+    """Loads the entries of date_range, through the cache if it is enabled."""
+    with _open_cache(options) as cache:
+        return RedNotebook.from_file(options.data_path, date_range, cache)
+
+
+@contextlib.contextmanager
+def _open_cache(options):
+    """Yields the parsed-entry cache, or None if it is disabled.
+
+    Entries are loaded without the cache as well when it can not be opened,
+    such as when its directory is read-only or its database is corrupt.
+    """
+    if not options.cache_path:
+        yield None
+        return
+    import sqlite3  # pylint: disable=import-outside-toplevel
+    try:
+        cache = storage.EntryCache(options.cache_path, options.cache_size)
+    except (OSError, sqlite3.Error) as error:
+        print(f'rn2md: not using the cache: {error}', file=sys.stderr)
+        yield None
+        return
+    with cache:
+        yield cache
+
+
+@contextlib.contextmanager
+def _open_search_index(options):
+    """Yields the search index, or an in-memory one if it can't be opened.
+
+    Without its file, the index is built again for every search, which is
+    slower but finds the same entries.
+    """
+    # search imports calendar, which is only needed to update the index.
+    import sqlite3  # pylint: disable=import-outside-toplevel
+    from . import search  # pylint: disable=import-outside-toplevel
+    try:
+        index = search.SearchIndex(options.search_index_path)
+    except (OSError, sqlite3.Error) as error:
+        print(f'rn2md: not using the search index file: {error}',
+              file=sys.stderr)
+        index = search.SearchIndex(':memory:')
+    with index:
+        yield index
+
+
+def _write_output(options, md_entries):
+    """Writes the markdown entries to the output of the given options."""
+    with _open_output(options) as output_file:
+        write_entries(md_entries, output_file)
+
+
+@contextlib.contextmanager
+def _open_output(options):
+    """Yields the file the markdown is written to, stdout by default."""
+    if options.output_path in ('', '-'):
+        yield sys.stdout
+        sys.stdout.flush()
+    else:
+        with open(options.output_path, 'w', encoding='utf-8') as output_file:
+            yield output_file
+
+
+def write_entries(md_entries, output_file):
+    """Writes each markdown entry as soon as it is available.
+
+    Separates entries with ENTRY_SEP so the output is the same as printing
+    `ENTRY_SEP.join(md_entries)`, without holding all of the entries in memory.
+    """
+    separator = ''
+    for md_entry in md_entries:
+        output_file.write(separator)
+        output_file.write(md_entry)
+        separator = ENTRY_SEP
+    output_file.write('\n')
 
-    red_notebook = RedNotebook.from_file(options.data_path)
-    date_range = (
-        util.parse_date_range(' '.join(remaining_argv), options.workdays_only)
-        if remaining_argv else options.default_date_range)
 
-    print(ENTRY_SEP.join(red_notebook.to_markdown(date_range)))
+COMMANDS = {
+    'batch': batch_markdown,
+    'export': export_markdown,
+    'search': search_markdown,
+    'serve': serve_markdown,
+}
 
 
 if __name__ == '__main__':
@@ -1,8 +1,10 @@
 """Builds configuration options for rn2md tool with nice default behavior."""
+import argparse
 import configparser
+import functools
 import os
 
-from . import util
+from . import export, profiling, storage, util
 
 
 class Options():
@@ -13,19 +15,58 @@ class Options():
         'data path': DEFAULT_DATA_PATH,
         'workday mode': 'off',
         'default date range': 'today',
+        'cache path': storage.EntryCache.DEFAULT_CACHE_PATH,
+        'cache size': str(storage.EntryCache.DEFAULT_MAX_SIZE),
+        'output path': '',
+        'jobs': '1',
+        'export layout': 'day',
+        'watch mode': 'off',
+        'profile path': '',
+        'tag filter': '',
     }
 
     @classmethod
     def from_argv(cls, argv):
-        """Make changes to the default options based on argv input."""
-        return cls(), argv[1:]
+        """Make changes to the default options based on argv input.
 
-    def __init__(self, section='DEFAULT'):
+        Flags given in argv take precedence over the values in ~/.rn2mdrc.
+
+        Returns:
+            The options, and the arguments of argv which are not flags.
+        """
+        parser = argparse.ArgumentParser(
+            prog='rn2md', allow_abbrev=False,
+            description='Prints RedNotebook entries in markdown syntax.')
+        parser.add_argument(
+            '-o', '--output', dest='output path', metavar='PATH',
+            help='file to write the markdown to, instead of stdout')
+        parser.add_argument(
+            '-j', '--jobs', dest='jobs', type=int, metavar='N',
+            help='number of processes to parse and format month files with')
+        parser.add_argument(
+            '--layout', dest='export layout', choices=export.LAYOUTS,
+            help='whether "export" writes one markdown file per day or month')
+        parser.add_argument(
+            '-w', '--watch', dest='watch mode', action='store_const',
+            const='on', help='output again whenever RedNotebook saves data')
+        parser.add_argument(
+            '--profile', dest='profile path', action='store_const', const='-',
+            help='print a summary of where time was spent to stderr')
+        parser.add_argument(
+            '--profile-json', dest='profile path', metavar='PATH',
+            help='write the stats of where time was spent to PATH as JSON')
+        parser.add_argument(
+            '-t', '--tag', dest='tag filter', metavar='TAG',
+            help='only output the entries which use the #TAG')
+        args, remaining_argv = parser.parse_known_args(argv[1:])
+        overrides = {k: str(v) for k, v in vars(args).items() if v is not None}
+        return cls(overrides=overrides), remaining_argv
+
+    def __init__(self, section='DEFAULT', overrides=None):
         self._config = configparser.ConfigParser(self.DEFAULT_CONFIG_VALUES)
         self._config.read(os.path.expanduser('~/.rn2mdrc'))
         self._section = section
-        self._default_date_range = util.parse_date_range(
-            self._config[section].get('default date range'))
+        self._config[section].update(overrides or {})
 
     @property
     def workdays_only(self):
@@ -37,7 +78,82 @@ class Options():
         """Read-only accessor for data path."""
         return self._config[self._section].get('data path')
 
-    @property
+    @functools.cached_property
     def default_date_range(self):
-        """Read-only accessor for default date range."""
-        return self._default_date_range
+        """Read-only accessor for default date range.
+
+        It is only parsed once it is needed, which is never when the date
+        range is given on the command line.
+        """
+        return util.parse_date_range(
+            self._config[self._section].get('default date range'))
+
+    @property
+    def cache_path(self):
+        """Read-only accessor for the parsed-entry cache path.
+
+        An empty value disables the cache.
+        """
+        cache_path = self._config[self._section].get('cache path')
+        return cache_path and os.path.expanduser(cache_path)
+
+    @property
+    def search_index_path(self):
+        """Read-only accessor for the search index path.
+
+        The index is kept next to the parsed-entry cache, or only in memory
+        while the cache is disabled.
+        """
+        cache_path = self.cache_path
+        if not cache_path:
+            return ':memory:'
+        return os.path.join(os.path.dirname(cache_path), 'search.sqlite3')
+
+    @property
+    def cache_size(self):
+        """Read-only accessor for the parsed-entry cache's size limit."""
+        return self._config[self._section].getint('cache size')
+
+    @property
+    def output_path(self):
+        """Read-only accessor for output path.
+
+        An empty value, or '-', means the markdown is written to stdout.
+        """
+        return self._config[self._section].get('output path')
+
+    @property
+    def jobs(self):
+        """Read-only accessor for the number of processes to export with."""
+        return self._config[self._section].getint('jobs')
+
+    @property
+    def export_layout(self):
+        """Read-only accessor for the layout of exported markdown files."""
+        return self._config[self._section].get('export layout')
+
+    @property
+    def watch(self):
+        """Read-only accessor for watch mode."""
+        return self._config[self._section].getboolean('watch mode')
+
+    @property
+    def profile_path(self):
+        """Read-only accessor for where profiling stats are written.
+
+        Falls back to the RN2MD_PROFILE environment variable. An empty value
+        disables profiling, and '-' or '1' print a summary to stderr.
+        """
+        profile_path = (self._config[self._section].get('profile path') or
+                        os.environ.get(profiling.ENV_VAR, ''))
+        return '-' if profile_path == '1' else profile_path
+
+    @property
+    def tag(self):
+        """Read-only accessor for the tag entries are filtered by.
+
+        The tag is lowercase and without its '#'. An empty value disables the
+        filter.
+        """
+        tag = self._config[self._section].get('tag filter')
+        return tag.lstrip('#').lower()
@@ -0,0 +1,123 @@
+"""Incrementally mirrors RedNotebook data into a tree of markdown files."""
+import json
+import os
+
+from . import formatters, storage
+
+MANIFEST_NAME = '.rn2md-manifest.json'
+LAYOUTS = ('day', 'month')
+
+
+def export_markdown_tree(data_path, output_path, layout='day'):
+    """Writes the RedNotebook entries as markdown files into output_path.
+
+    Only the month files which changed since the previous export into
+    output_path are parsed and formatted again. The state of the previous
+    export is kept in a manifest file within output_path, which records the
+    mtime and size of every month file and the markdown files written for it.
+    Markdown files whose entries no longer exist are deleted.
+
+    Args:
+        data_path: directory holding RedNotebook's YYYY-MM.txt month files.
+        output_path: directory to write the markdown files into.
+        layout: either 'day', to write one YYYY-MM-DD.md file for every entry,
+            or 'month', to write one YYYY-MM.md file for every month.
+
+    Returns:
+        (written, deleted) lists of the markdown files which were written and
+        deleted, relative to output_path.
+
+    Raises:
+        ValueError: layout is not one of LAYOUTS.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f'{layout!r} is not a valid layout (expected one of '
+                         f'{list(LAYOUTS)!r})')
+    os.makedirs(output_path, exist_ok=True)
+    manifest = _load_manifest(output_path)
+    old_months = manifest['months']
+    written, deleted = [], []
+    if manifest['layout'] != layout:
+        # Files written for another layout can not be reused.
+        for old_month in old_months.values():
+            deleted.extend(_delete_outputs(output_path, old_month['outputs']))
+        old_months = {}
+    new_months = {}
+    for month_date, month_path in storage.find_month_files(data_path):
+        month_name = os.path.basename(month_path)
+        month_stat = os.stat(month_path)
+        old_month = old_months.pop(month_name, None)
+        if old_month is not None and (
+                old_month['mtime_ns'] == month_stat.st_mtime_ns and
+                old_month['size'] == month_stat.st_size):
+            new_months[month_name] = old_month
+            continue
+        entries = storage.load_month_entries(month_date, month_path)
+        outputs = _write_month(output_path, month_date, entries, layout)
+        written.extend(outputs)
+        new_months[month_name] = {
+            'mtime_ns': month_stat.st_mtime_ns,
+            'size': month_stat.st_size,
+            'outputs': outputs,
+        }
+        if old_month is not None:
+            stale_outputs = sorted(set(old_month['outputs']) - set(outputs))
+            deleted.extend(_delete_outputs(output_path, stale_outputs))
+    # Any months left over belong to month files which no longer exist.
+    for old_month in old_months.values():
+        deleted.extend(_delete_outputs(output_path, old_month['outputs']))
+    _save_manifest(output_path, {'layout': layout, 'months': new_months})
+    return written, deleted
+
+
+def _write_month(output_path, month_date, entries, layout):
+    """Writes the month's entries as markdown and returns the files' names."""
+    dates = sorted(entries)
+    if layout == 'day':
+        md_files = {
+            f'{date.isoformat()}.md': md_entry
+            for date, md_entry in zip(
+                dates, formatters.format_entries(entries[d] for d in dates))
+        }
+    elif dates:
+        md_files = {
+            f'{month_date:%Y-%m}.md': formatters.ENTRY_SEP.join(
+                formatters.format_entries(entries[d] for d in dates)),
+        }
+    else:
+        md_files = {}
+    for md_name, md_content in md_files.items():
+        md_path = os.path.join(output_path, md_name)
+        with open(md_path, 'w', encoding='utf-8') as md_file:
+            md_file.write(md_content + '\n')
+    return list(md_files)
+
+
+def _delete_outputs(output_path, md_names):
+    """Deletes the markdown files and returns the names of the deleted ones."""
+    deleted = []
+    for md_name in md_names:
+        try:
+            os.remove(os.path.join(output_path, md_name))
+        except FileNotFoundError:
+            continue
+        deleted.append(md_name)
+    return deleted
+
+
+def _load_manifest(output_path):
+    """Returns the manifest of the previous export into output_path."""
+    try:
+        with open(os.path.join(output_path, MANIFEST_NAME),
+                  encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return {'layout': None, 'months': {}}
+
+
+def _save_manifest(output_path, manifest):
+    """Replaces the manifest of output_path with the given one."""
+    manifest_path = os.path.join(output_path, MANIFEST_NAME)
+    with open(f'{manifest_path}.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
@@ -13,17 +13,141 @@ Here is a summary of the currently implemented formatters:
     - Unordered item                  - Unordered item
     ``asdf``                          `asdf`
 """
+import bisect
+import functools
+import itertools
+import os
 import re
+import time
+
+from . import profiling, util
+
+# Separates entries when several of them are written into the same output.
+ENTRY_SEP = '\n\n\n'
+
+# Every pattern used by the formatters, compiled once when rn2md starts.
+_LINK_PATTERN = re.compile(r'\[([^\]]*?) ""(.*?)""\]')
+_IMAGE_PATTERN = re.compile(r'\[""(.*?)""\]')
+_BACKTICKS_PATTERN = re.compile(r'`.*?`')
+_CODE_DELIM_PATTERN = re.compile(r'``')
+_ITALIC_DELIM_PATTERN = re.compile(r'//')
+_STRIKETHROUGH_DELIM_PATTERN = re.compile(r'--')
+_INNER_UNDERSCORE_PATTERN = re.compile(r'(?<=\w)_(?=\w)')
+_HEADER_START_PATTERN = re.compile(r'^=+')
+_HEADER_END_PATTERN = re.compile(r'=+$')
+_LIST_ITEM_PATTERN = re.compile(r'^\s*([-|\+])\s')
+# Every kind of RedNotebook markup, including headers and list markers, uses
+# at least one of these characters.
+_MARKUP_PATTERN = re.compile(r'[\[`/_=+|-]')
+_DELIM_TOKENS = r'''
+    (?P<code>``)
+  | (?P<tick>`)
+  | (?P<italic>//)
+  | (?P<strike>--)
+  | (?P<underscore>(?<=\w)_(?=\w))
+'''
+# The leading lookaheads let the regex engine skip over plain text quickly.
+_DELIM_TOKEN_PATTERN = re.compile(
+    r'(?=[`/_-])(?:' + _DELIM_TOKENS + ')', re.VERBOSE)
+# Tokenizes the text around links, which are matched with _LINK_PATTERN first.
+_LINE_TOKEN_PATTERN = re.compile(r'''(?=[\[`/_-])(?:
+    (?P<image>\[""(?P<image_url>.*?)""\])
+  | ''' + _DELIM_TOKENS + ')', re.VERBOSE)
 
-import defaultlist
 
-from . import util
+@util.prime_coroutine_generator
+def format_rednotebook_as_markdown(header_padding=0):
+    """Creates markdown-formatted lines by tokenizing each line only once.
+
+    Produces the same output as `format_rednotebook_as_markdown_in_stages`,
+    but instead of re-scanning each line with every formatter, a line is split
+    into tokens once and the tokens are then substituted in place.
+    """
+    formatter = MarkdownFormatter(header_padding=header_padding)
+    line = ''
+    while True:
+        line = yield line
+        line = formatter.send(line)
+
+
+class MarkdownFormatter():
+    """Reusable version of `format_rednotebook_as_markdown`.
+
+    Accepts lines through the same `send(line)` method as the coroutine
+    formatters, but can also be `reset()` between entries. This lets a single
+    instance format any number of entries without paying for its setup again.
+    """
+
+    def __init__(self, header_padding=0):
+        self._header_padding = header_padding
+        self._list_numbering = _ListNumbering()
+        self._list_format = self._list_numbering.format
+        self._line_tokens = _LineTokens
+        if profiling.enabled():
+            # Only formatters created while profiling pay for recording stats.
+            self._list_format = _profiled_list_format(self._list_format)
+            self._line_tokens = _ProfiledLineTokens
+
+    def send(self, line):
+        """Returns the markdown-formatted version of the given line."""
+        return self._list_format(
+            _format_line(line, self._header_padding, self._line_tokens))
+
+    def reset(self):
+        """Forgets the state of previous lines, like list numbering."""
+        self._list_numbering.reset()
+
+    def format_entry(self, entry):
+        """Returns the markdown-formatted version of an entire entry.
+
+        Unlike `send(line)`, the formatter is reset before the entry's first
+        line and trailing whitespace is stripped from every line.
+        """
+        self.reset()
+        lines = [line.rstrip() for line in entry.split('\n')]
+        if not _MARKUP_PATTERN.search(entry):
+            # Nothing to transform, so skip formatting the lines one-by-one.
+            return '\n'.join(lines)
+        header_padding = self._header_padding
+        line_tokens = self._line_tokens
+        list_format = self._list_format
+        return '\n'.join([
+            list_format(_format_line(line, header_padding, line_tokens))
+            for line in lines
+        ])
+
+
+def format_entry(entry, header_padding=0):
+    """Transforms an entire RedNotebook-styled entry into markdown-syntax."""
+    return MarkdownFormatter(header_padding=header_padding).format_entry(entry)
+
+
+def format_entries(entries, header_padding=0):
+    """Yields each of the RedNotebook-styled entries in markdown-syntax."""
+    formatter = MarkdownFormatter(header_padding=header_padding)
+    for entry in entries:
+        yield formatter.format_entry(entry)
 
 
 @util.prime_coroutine_generator
-def format_rednotebook_as_markdown(header_padding=0):
+def format_rednotebook_as_markdown_in_stages(header_padding=0):
     """Sequences all other formatters to create markdown-formatted lines."""
-    ordered_formatters = [
+    ordered_formatters = [*_line_formatters(header_padding), format_lists()]
+    if profiling.enabled():
+        ordered_formatters = [
+            profiling.profiled_stage(formatter)
+            for formatter in ordered_formatters
+        ]
+    line = ''
+    while True:
+        line = yield line
+        for formatter in ordered_formatters:
+            line = formatter.send(line)
+
+
+def _line_formatters(header_padding=0):
+    """Returns the ordered formatters which transform lines independently."""
+    return [
         format_inner_underscores(),
         format_links(),
         format_images(),
@@ -31,13 +155,7 @@ def format_rednotebook_as_markdown(header_padding=0):
         format_code_blocks(),
         format_italic_text(),
         format_strikethrough_text(),
-        format_lists(),
     ]
-    line = ''
-    while True:
-        line = yield line
-        for formatter in ordered_formatters:
-            line = formatter.send(line)
 
 
 @util.prime_coroutine_generator
@@ -45,7 +163,7 @@ def format_links():
     """Transforms '[[text ""url""]]' to '[text](url)'."""
     line = ''
     while True:
-        line = yield re.sub(r'\[([^\]]*?) ""(.*?)""\]', r'[\1](\2)', line)
+        line = yield _LINK_PATTERN.sub(r'[\1](\2)', line)
 
 
 @util.prime_coroutine_generator
@@ -53,7 +171,7 @@ def format_images():
     """Transforms '[[""image url""]]' to '![](image url)'."""
     line = ''
     while True:
-        line = yield re.sub(r'\[""(.*?)""\]', r'![](\1)', line)
+        line = yield _IMAGE_PATTERN.sub(r'![](\1)', line)
 
 
 @util.prime_coroutine_generator
@@ -61,7 +179,7 @@ def format_italic_text():
     """Transforms '//text//' to '_text_'."""
     line = ''
     while True:
-        line = yield _sub_balanced_delims('//', '_', line)
+        line = yield _sub_balanced_delims(_ITALIC_DELIM_PATTERN, '_', line)
 
 
 @util.prime_coroutine_generator
@@ -71,7 +189,8 @@ def format_strikethrough_text():
     while True:
         line = yield line
         if line != ('-' * len(line)):
-            line = _sub_balanced_delims('--', '~', line)
+            line = _sub_balanced_delims(
+                _STRIKETHROUGH_DELIM_PATTERN, '~', line)
 
 
 @util.prime_coroutine_generator
@@ -79,7 +198,8 @@ def format_code_blocks():
     """Transforms codeblocks into markdown-syntax."""
     line = ''
     while True:
-        line = yield _sub_balanced_delims('``', '`', line, preds=[_not_in_link])
+        line = yield _sub_balanced_delims(
+            _CODE_DELIM_PATTERN, '`', line, preds=[_not_in_link])
 
 
 @util.prime_coroutine_generator
@@ -88,10 +208,10 @@ def format_headers(padding=0):
     line = ''
     while True:
         line = yield line
-        start_delim = re.search(r'^=+', line)
+        start_delim = _HEADER_START_PATTERN.search(line)
         if not start_delim or start_delim.group() == line:
             continue
-        end_delim = re.search(r'=+$', line)
+        end_delim = _HEADER_END_PATTERN.search(line)
         if not end_delim or end_delim.group() != start_delim.group():
             continue
         level = len(start_delim.group())
@@ -101,12 +221,30 @@ def format_headers(padding=0):
 @util.prime_coroutine_generator
 def format_lists():
     """Transforms ordered and unordered lists into markdown-syntax."""
-    ordered_list_history = defaultlist.defaultlist(lambda: 1)
-    sequential_empty_lines = 0
+    list_numbering = _ListNumbering()
     line = ''
     while True:
         line = yield line
-        list_item_match = re.match(r'^\s*([-|\+])\s', line)
+        line = list_numbering.format(line)
+
+
+class _ListNumbering():
+    """Tracks the numbering of ordered lists across sequential lines."""
+
+    def __init__(self):
+        import defaultlist  # pylint: disable=import-outside-toplevel
+        self._ordered_list_history = defaultlist.defaultlist(lambda: 1)
+        self._sequential_empty_lines = 0
+
+    def reset(self):
+        """Forgets all list items seen so far."""
+        self._ordered_list_history.clear()
+        self._sequential_empty_lines = 0
+
+    def format(self, line):
+        """Returns the line with its list marker transformed, if it has one."""
+        ordered_list_history = self._ordered_list_history
+        list_item_match = _LIST_ITEM_PATTERN.match(line)
         if list_item_match:
             i = list_item_match.start(1)
             if line[i] == '-':
@@ -119,12 +257,13 @@ def format_lists():
             # Reset numbering of sub-items.
             del ordered_list_history[i + 1:]
         elif line.strip():
-            sequential_empty_lines = 0
+            self._sequential_empty_lines = 0
             ordered_list_history.clear()
         else:
-            sequential_empty_lines += 1
-            if sequential_empty_lines >= 2:
+            self._sequential_empty_lines += 1
+            if self._sequential_empty_lines >= 2:
                 ordered_list_history.clear()
+        return line
 
 
 @util.prime_coroutine_generator
@@ -133,20 +272,256 @@ def format_inner_underscores():
     line = ''
     while True:
         line = yield line
-        inner_underscores = list(_filter_matches(r'(?<=\w)_(?=\w)', line))
-        for match in reversed(inner_underscores):
-            line = f'{line[:match.start()]}\\_{line[match.end():]}'
+        inner_underscores = _filter_matches(_INNER_UNDERSCORE_PATTERN, line)
+        line = _sub_matches(inner_underscores, '\\_', line)
+
+
+class _LineTokens():
+    """Markdown output of a line, with the positions of its delimiters.
+
+    Every delimiter is recorded as an (output index, span) pair, where span is
+    the delimiter's position in the original line. Delimiters are emitted as-is
+    and are only substituted once the entire line has been tokenized, because
+    pairing them up requires knowing about every other delimiter in the line.
+    """
+
+    def __init__(self, line):
+        self.line = line
+        self.output = []
+        self.delims = {
+            'code': [], 'italic': [], 'strike': [], 'underscore': [],
+        }
+        self.backticks = []
+        self.num_images = 0
+        self.image_openers = 0
+
+    def scan_line(self, start, end):
+        """Tokenizes line[start:end] and appends its output.
+
+        Like the staged formatters, every link is matched before any image, so
+        only the text around links is searched for images.
+
+        Returns:
+            False if the line needs the staged formatters for the same
+            output, which happens when an image might overlap a link, or when
+            substituting links and images forms a new link. The output is
+            then incomplete.
+        """
+        num_links = 0
+        scan_start = start
+        for link in _LINK_PATTERN.finditer(self.line, start, end):
+            self.scan(scan_start, link.start())
+            self.output.append('[')
+            self.scan(*link.span(1), _DELIM_TOKEN_PATTERN)
+            self.output.append('](')
+            self.scan(*link.span(2), _DELIM_TOKEN_PATTERN, True)
+            self.output.append(')')
+            scan_start = link.end()
+            num_links += 1
+        self.scan(scan_start, end)
+        # Each image starts with '[""', so none overlaps a link if every
+        # '[""' of the line is within the images found around the links.
+        if num_links and (
+                self.line.count('[""', start, end) != self.image_openers):
+            return False
+        # Links and images hold a single '""]', at their end, and their
+        # substitutions hold none. So only another '""]' of the line can end
+        # a link formed by the substitutions, and the staged formatters leave
+        # the delimiters within such links as they are.
+        num_ends = num_links + self.num_images
+        if num_ends and self.line.count('""]', start, end) > num_ends and any(
+                self.delims[kind] for kind in ('code', 'italic', 'strike')):
+            return not _LINK_PATTERN.search(''.join(self.output))
+        return True
+
+    def scan(self, start, end, pattern=_LINE_TOKEN_PATTERN, in_url=False):
+        """Tokenizes line[start:end] and appends its output."""
+        for match in pattern.finditer(self.line, start, end):
+            self.output.append(self.line[start:match.start()])
+            start = match.end()
+            kind = match.lastgroup
+            if kind == 'image':
+                self.num_images += 1
+                self.image_openers += match.group().count('[""')
+                self.output.append('![](')
+                self.scan(*match.span('image_url'), _DELIM_TOKEN_PATTERN)
+                self.output.append(')')
+                continue
+            if kind in ('tick', 'code'):
+                self.backticks.append((len(self.output), match.span()))
+            if kind != 'tick' and not (kind == 'underscore' and in_url):
+                # Underscores in link urls are never escaped.
+                self.delims[kind].append((len(self.output), match.span()))
+            self.output.append(match.group())
+        self.output.append(self.line[start:end])
+
+    def sub_inner_underscores(self):
+        """Escapes the underscores which are not enclosed by backticks."""
+        if not self.delims['underscore']:
+            return
+        ticks = [
+            i for unused_i, (lo, hi) in self.backticks for i in range(lo, hi)
+        ]
+        spans = _SpanIndex(
+            (lo, hi + 1) for lo, hi in zip(ticks[::2], ticks[1::2]))
+        for i, span in self.delims['underscore']:
+            if not spans.intersects(span):
+                self.output[i] = '\\_'
+
+    def sub_code_blocks(self):
+        """Replaces balanced pairs of '``' with '`'."""
+        code_delims = self.delims['code']
+        for i, unused_span in code_delims[:len(code_delims) // 2 * 2]:
+            self.output[i] = '`'
+
+    def sub_balanced_delims(self, subs):
+        """Replaces balanced delimiters which are not enclosed by backticks.
+
+        Args:
+            subs: mapping of delimiter kinds to their substitution. Must be
+                called after sub_code_blocks, since balanced code blocks only
+                leave a single backtick behind.
+        """
+        if not any(self.delims[kind] for kind in subs):
+            return
+        ticks = []
+        for i, (lo, hi) in self.backticks:
+            if self.output[i] == '``':
+                ticks.extend([(lo, lo + 1), (lo + 1, hi)])
+            else:
+                ticks.append((lo, hi))
+        spans = _SpanIndex(
+            (lo, hi) for (lo, _), (_, hi) in zip(ticks[::2], ticks[1::2]))
+        for kind, sub in subs.items():
+            delims = [
+                i for i, span in self.delims[kind]
+                if not spans.intersects(span)
+            ]
+            for i in delims[:len(delims) // 2 * 2]:
+                self.output[i] = sub
+
+    def format_in_stages(self, header_padding=0):
+        """Returns the line formatted by the staged formatters instead."""
+        line = self.line
+        for formatter in _line_formatters(header_padding):
+            line = formatter.send(line)
+        return line
+
+
+def _scanned_bytes(line_tokens, start, end):
+    """Returns the number of UTF-8 bytes scan_line is called to tokenize."""
+    return len(line_tokens.line[start:end].encode('utf-8'))
+
+
+def _changed_bytes(text, new_text):
+    """Returns the UTF-8 bytes changed between text and new_text.
+
+    Only the part between their common prefix and suffix changed, and its
+    bytes are counted in whichever of the two texts holds more of them.
+
+    Example:
+        >>> _changed_bytes('+ item', '1. item')
+        ... 2
+    """
+    if new_text == text:
+        return 0
+    prefix = len(os.path.commonprefix([text, new_text]))
+    text, new_text = text[prefix:], new_text[prefix:]
+    suffix = len(os.path.commonprefix([text[::-1], new_text[::-1]]))
+    return max(len(text[:len(text) - suffix].encode('utf-8')),
+               len(new_text[:len(new_text) - suffix].encode('utf-8')))
+
+
+def _profiled_list_format(list_format):
+    """Wraps _ListNumbering.format to record the bytes of list markers."""
+    @functools.wraps(list_format)
+    def profiled_list_format(line):
+        start = time.perf_counter()
+        formatted_line = list_format(line)
+        profiling.record('format.lists', time.perf_counter() - start,
+                         _changed_bytes(line, formatted_line))
+        return formatted_line
+    return profiled_list_format
+
+
+def _profiled_sub(name, sub):
+    """Wraps a sub_* step of _LineTokens to record the bytes it changes.
+
+    The output tokens are copied before the step, outside of the recorded
+    time, so the tokens the step replaced can be counted afterwards.
+    """
+    @functools.wraps(sub)
+    def profiled_sub(line_tokens, *args):
+        output = line_tokens.output[:]
+        start = time.perf_counter()
+        sub(line_tokens, *args)
+        profiling.record(name, time.perf_counter() - start, sum(
+            _changed_bytes(token, new_token)
+            for token, new_token in zip(output, line_tokens.output)))
+    return profiled_sub
+
+
+class _ProfiledLineTokens(_LineTokens):
+    """_LineTokens which records the stats of each of its steps.
+
+    For format.scan, the bytes recorded are those of the line tokenized. For
+    the other steps, they are the bytes of markup which the step changed.
+    """
+
+    scan_line = profiling.profiled('format.scan', num_bytes=_scanned_bytes)(
+        _LineTokens.scan_line)
+    sub_inner_underscores = _profiled_sub(
+        'format.underscores', _LineTokens.sub_inner_underscores)
+    sub_code_blocks = _profiled_sub(
+        'format.code', _LineTokens.sub_code_blocks)
+    sub_balanced_delims = _profiled_sub(
+        'format.delims', _LineTokens.sub_balanced_delims)
+
+    def format_in_stages(self, header_padding=0):
+        start = time.perf_counter()
+        formatted_line = super().format_in_stages(header_padding)
+        profiling.record('format.stages', time.perf_counter() - start,
+                         _changed_bytes(self.line, formatted_line))
+        return formatted_line
+
+
+def _format_line(line, header_padding=0, line_tokens=_LineTokens):
+    """Transforms a single RedNotebook-styled line into markdown-syntax.
+
+    Args:
+        line: the line to transform.
+        header_padding: number of levels added to headers.
+        line_tokens: _LineTokens, or a subclass of it, to tokenize line with.
+    """
+    start, end, header = 0, len(line), ''
+    if line.startswith('='):
+        level = len(line) - len(line.lstrip('='))
+        if level < end and line.endswith('=' * level) and (
+                line[-level - 1] != '='):
+            end -= level
+            start = end - len(line[level:end].lstrip())
+            header = f'{"#" * (header_padding + level)} '
+    tokens = line_tokens(line)
+    if not tokens.scan_line(start, end):
+        return tokens.format_in_stages(header_padding)
+    tokens.sub_inner_underscores()
+    tokens.sub_code_blocks()
+    if line != ('-' * len(line)):
+        tokens.sub_balanced_delims({'italic': '_', 'strike': '~'})
+    else:
+        tokens.sub_balanced_delims({'italic': '_'})
+    return header + ''.join(tokens.output)
 
 
 def _sub_balanced_delims(delim_pattern, sub, string, **kwargs):
     """Finds paired delimiters and replaces them with a substitution.
 
     Example:
-        >>> _sub_balanced_delims('_', '*', '^_test_$')
+        >>> _sub_balanced_delims(re.compile('_'), '*', '^_test_$')
         ... '^*test*$'
 
     Args:
-        delim_pattern: regex for the delimiter to replace.
+        delim_pattern: compiled regex for the delimiter to replace.
         sub: delimiter to use instead. Can either be a string or a 2-tuple.
         string: string to have delimiters replaced.
         **kwargs: downstream arguments for _filter_matches.
@@ -159,38 +534,92 @@ def _sub_balanced_delims(delim_pattern, sub, string, **kwargs):
     except ValueError:
         start_sub = end_sub = sub
     delims = _filter_matches(delim_pattern, string, **kwargs)
-    balanced_delims = list(zip(delims, delims))
-    # Do substitutions in reverse so the match indices stay valid.
-    for start_delim, end_delim in reversed(balanced_delims):
-        start = string[:start_delim.start()]
-        data = string[start_delim.end():end_delim.start()]
-        end = string[end_delim.end():]
-        string = f'{start}{start_sub}{data}{end_sub}{end}'
-    return string
+    balanced_delims = itertools.chain.from_iterable(zip(delims, delims))
+    subs = itertools.cycle([start_sub, end_sub])
+    return _sub_matches(balanced_delims, subs, string)
+
+
+def _sub_matches(matches, subs, string):
+    """Replaces each of the ordered matches with its substitution.
+
+    Args:
+        matches: ordered, non-overlapping matches found in string.
+        subs: substitution for every match, or a single string for all of them.
+        string: string to have the matches replaced.
+
+    Returns:
+        new string where all of the matches are substituted.
+    """
+    if isinstance(subs, str):
+        subs = itertools.repeat(subs)
+    pieces = []
+    end = 0
+    for match, sub in zip(matches, subs):
+        pieces.extend([string[end:match.start()], sub])
+        end = match.end()
+    pieces.append(string[end:])
+    return ''.join(pieces)
 
 
 def _filter_matches(pattern, string, preds=None):
     """Returns iterable of matches that pass all of the predicates in `preds`.
 
+    Predicates are built once per string by calling each of `preds` with it,
+    so that they do not need to re-scan the string for every match.
+
     If no predicates are provided, they default to:
         - Match must not appear in link.
         - Match must not appear in backticks.
     """
     if preds is None:
         preds = (_not_in_link, _not_in_backticks)
-    return (m for m in re.finditer(pattern, string) if all(p(m) for p in preds))
+    preds = [make_pred(string) for make_pred in preds]
+    return (m for m in pattern.finditer(string) if all(p(m) for p in preds))
+
+
+def _not_in_link(string):
+    """Returns predicate for whether a match is outside of link urls."""
+    link_urls = _link_url_spans(string)
+    return lambda match: not link_urls.intersects(match.span())
+
 
+def _not_in_backticks(string):
+    """Returns predicate for whether a match is outside of backticks."""
+    backticks = _backtick_spans(string)
+    return lambda match: not backticks.intersects(match.span())
 
-def _not_in_link(match):
-    links = re.finditer(r'\[([^\]]*?) ""(.*?)""\]', match.string)
-    return not any(_spans_intersect(match.span(), m.span(2)) for m in links)
 
+# The spans are remembered for the last few lines, so that the stages which
+# pass a line on unchanged do not scan it for links and backticks again.
+@functools.lru_cache(maxsize=16)
+def _link_url_spans(string):
+    """Returns a _SpanIndex of the link urls in string."""
+    return _SpanIndex(m.span(2) for m in _LINK_PATTERN.finditer(string))
 
-def _not_in_backticks(match):
-    backticks = re.finditer(r'`.*?`', match.string)
-    return not any(_spans_intersect(match.span(), m.span()) for m in backticks)
 
+@functools.lru_cache(maxsize=16)
+def _backtick_spans(string):
+    """Returns a _SpanIndex of the backtick-enclosed text in string."""
+    return _SpanIndex(m.span() for m in _BACKTICKS_PATTERN.finditer(string))
+
+
+class _SpanIndex():
+    """Answers whether a span intersects any of a sorted sequence of spans.
+
+    The spans must be ordered and must not overlap, which is the case for the
+    spans of `re.finditer` matches. Lookups use a binary search, so filtering
+    all of a line's matches takes O(matches * log(spans)) time.
+    """
 
-def _spans_intersect(span1, span2):
-    (lo1, hi1), (lo2, hi2) = sorted(span1), sorted(span2)
-    return hi1 >= lo2 and hi2 >= lo1
+    def __init__(self, spans):
+        self._starts = []
+        self._ends = []
+        for start, end in spans:
+            self._starts.append(start)
+            self._ends.append(end)
+
+    def intersects(self, span):
+        """Returns whether span intersects, or touches, any indexed span."""
+        lo, hi = span
+        i = bisect.bisect_left(self._ends, lo)
+        return i < len(self._starts) and self._starts[i] <= hi
@@ -0,0 +1,133 @@
+"""Opt-in profiling of where rn2md spends its time.
+
+When enabled, through the --profile flag or the RN2MD_PROFILE environment
+variable, the calls, time and bytes processed of every step of formatting
+lines and of loading month files are recorded. While disabled, formatters do
+not wrap their steps at all and profiled functions only check `enabled()` once
+per call.
+"""
+import dataclasses
+import functools
+import json
+import threading
+import time
+
+from . import util
+
+ENV_VAR = 'RN2MD_PROFILE'
+
+_STATS = None
+# Stats are recorded by the threads loading month files as well.
+_STATS_LOCK = threading.Lock()
+
+
+@dataclasses.dataclass
+class StageStats:
+    """What was recorded for a single stage.
+
+    For format.scan, `bytes` counts the UTF-8 bytes of the lines tokenized.
+    For the other steps of the single-pass formatter, it counts the UTF-8
+    bytes of markup a step changed. For the stages of the staged formatters,
+    it counts the UTF-8 bytes of the lines a stage changed. For storage.load,
+    it counts the bytes of the month files read.
+    """
+    calls: int = 0
+    seconds: float = 0.0
+    bytes: int = 0
+
+
+def enable():
+    """Starts recording stats, forgetting any recorded before."""
+    global _STATS  # pylint: disable=global-statement
+    _STATS = {}
+
+
+def disable():
+    """Stops recording stats."""
+    global _STATS  # pylint: disable=global-statement
+    _STATS = None
+
+
+def enabled():
+    """Returns whether stats are being recorded."""
+    return _STATS is not None
+
+
+def stats():
+    """Returns a dict mapping the name of every recorded stage to its stats."""
+    return dict(_STATS or {})
+
+
+def record(name, seconds, num_bytes=0):
+    """Adds a call of the named stage to its stats, if profiling is enabled."""
+    if _STATS is None:
+        return
+    with _STATS_LOCK:
+        stage_stats = _STATS.setdefault(name, StageStats())
+        stage_stats.calls += 1
+        stage_stats.seconds += seconds
+        stage_stats.bytes += num_bytes
+
+
+def profiled(name, num_bytes=None):
+    """Decorates a function so its calls are recorded under name.
+
+    Args:
+        name: name of the stage the function's calls are recorded as.
+        num_bytes: optional function called with the decorated function's
+            arguments, returning the number of bytes the call processes.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def profiled_func(*args, **kwargs):
+            if _STATS is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start,
+                       num_bytes(*args, **kwargs) if num_bytes else 0)
+        return profiled_func
+    return decorator
+
+
+@util.prime_coroutine_generator
+def profiled_stage(formatter, name=None):
+    """Wraps a coroutine formatter so each line it formats is recorded.
+
+    Args:
+        formatter: primed coroutine formatter, such as `format_links()`.
+        name: name of the stage, defaults to the formatter's name.
+    """
+    name = name or formatter.__name__
+    line = ''
+    while True:
+        line = yield line
+        start = time.perf_counter()
+        formatted_line = formatter.send(line)
+        seconds = time.perf_counter() - start
+        record(name, seconds, (
+            len(formatted_line.encode('utf-8'))
+            if formatted_line != line else 0))
+        line = formatted_line
+
+
+def format_summary():
+    """Returns a table of the recorded stats, most expensive stage first."""
+    rows = [f'{"stage":<28} {"calls":>9} {"seconds":>9} {"bytes":>11}']
+    for name, stage_stats in sorted(
+            stats().items(), key=lambda item: -item[1].seconds):
+        rows.append(f'{name:<28} {stage_stats.calls:>9} '
+                    f'{stage_stats.seconds:>9.4f} {stage_stats.bytes:>11}')
+    return '\n'.join(rows) + '\n'
+
+
+def write_json(path):
+    """Writes the recorded stats to path as a JSON object."""
+    with open(path, 'w', encoding='utf-8') as stats_file:
+        json.dump({
+            name: dataclasses.asdict(stage_stats)
+            for name, stage_stats in stats().items()
+        }, stats_file, indent=2)
+        stats_file.write('\n')
@@ -0,0 +1,134 @@
+"""Full-text search of RedNotebook entries through a persisted index."""
+import calendar
+import datetime as dt
+import os
+import re
+
+from . import storage
+
+_TERM_PATTERN = re.compile(r'\w+')
+
+
+def extract_terms(text):
+    """Returns the set of lowercase words in text, as they are indexed."""
+    return set(_TERM_PATTERN.findall(text.lower()))
+
+
+class SearchIndex():
+    """Inverted index from words to the dates of the entries which use them.
+
+    The index remembers the mtime and size of every month file it indexed, so
+    `update` only parses and re-indexes the month files which changed.
+
+    Raises:
+        OSError: the index's directory could not be created.
+        sqlite3.Error: the index's database could not be opened.
+    """
+
+    DEFAULT_INDEX_PATH = os.path.expanduser('~/.cache/rn2md/search.sqlite3')
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        if index_path != ':memory:':
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        import sqlite3  # pylint: disable=import-outside-toplevel
+        self._db = sqlite3.connect(index_path)
+        try:
+            with self._db:
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS month_files ('
+                    '    path TEXT PRIMARY KEY,'
+                    '    month_ordinal INTEGER NOT NULL,'
+                    '    mtime_ns INTEGER NOT NULL,'
+                    '    size INTEGER NOT NULL)')
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS postings ('
+                    '    term TEXT NOT NULL,'
+                    '    ordinal INTEGER NOT NULL,'
+                    '    PRIMARY KEY (term, ordinal)) WITHOUT ROWID')
+                self._db.execute(
+                    'CREATE INDEX IF NOT EXISTS postings_by_ordinal '
+                    'ON postings (ordinal)')
+        except sqlite3.Error:
+            self._db.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the underlying database connection."""
+        self._db.close()
+
+    def update(self, data_path, cache=None):
+        """Re-indexes the month files in data_path which changed.
+
+        Args:
+            data_path: directory holding RedNotebook's YYYY-MM.txt files.
+            cache: optional EntryCache used to skip parsing month files.
+
+        Returns:
+            the number of month files which were (re-)indexed or dropped.
+        """
+        indexed_months = {
+            path: (month_ordinal, (mtime_ns, size))
+            for path, month_ordinal, mtime_ns, size in self._db.execute(
+                'SELECT path, month_ordinal, mtime_ns, size FROM month_files')
+        }
+        num_changes = 0
+        with self._db:
+            month_files = storage.find_month_files(data_path)
+            month_paths = {month_path for _, month_path in month_files}
+            for month_path, (month_ordinal, _) in indexed_months.items():
+                if month_path not in month_paths:
+                    self._drop_month(
+                        month_path, dt.date.fromordinal(month_ordinal))
+                    num_changes += 1
+            for month_date, month_path in month_files:
+                month_stat = os.stat(month_path)
+                indexed_month = indexed_months.get(month_path)
+                if indexed_month == (month_date.toordinal(), (
+                        month_stat.st_mtime_ns, month_stat.st_size)):
+                    continue
+                self._drop_month(month_path, month_date)
+                entries = storage.load_month_entries(
+                    month_date, month_path, cache)
+                self._db.executemany(
+                    'INSERT INTO postings VALUES (?, ?)',
+                    ((term, date.toordinal())
+                     for date, entry in entries.items()
+                     for term in extract_terms(entry)))
+                self._db.execute(
+                    'INSERT INTO month_files VALUES (?, ?, ?, ?)',
+                    (month_path, month_date.toordinal(),
+                     month_stat.st_mtime_ns, month_stat.st_size))
+                num_changes += 1
+        return num_changes
+
+    def search(self, query):
+        """Returns the sorted dates of the entries using every word of query.
+
+        Words are matched case-insensitively and in full, so 'cat' does not
+        match entries which only mention 'cats'.
+        """
+        terms = extract_terms(query)
+        if not terms:
+            return []
+        rows = self._db.execute(
+            'SELECT ordinal FROM postings '
+            f'WHERE term IN ({", ".join("?" * len(terms))}) '
+            'GROUP BY ordinal HAVING COUNT(*) = ? ORDER BY ordinal',
+            (*terms, len(terms)))
+        return [dt.date.fromordinal(ordinal) for ordinal, in rows]
+
+    def _drop_month(self, month_path, month_date):
+        """Removes a month file, and the postings of its dates, if indexed."""
+        _, num_days = calendar.monthrange(month_date.year, month_date.month)
+        self._db.execute(
+            'DELETE FROM postings WHERE ordinal BETWEEN ? AND ?',
+            (month_date.toordinal(),
+             month_date.replace(day=num_days).toordinal()))
+        self._db.execute(
+            'DELETE FROM month_files WHERE path = ?', (month_path,))
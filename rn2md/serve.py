@@ -0,0 +1,189 @@
+"""Serves RedNotebook entries as markdown from a small HTTP server.
+
+The server understands these GET requests:
+    /date/<yyyy-mm-dd>: the entry of the given day.
+    /week/<expr>: the entries of the week of a date expression, e.g.
+        /week/2018-03-21 or /week/last%20week.
+    /range?start=<expr>&end=<expr>: the entries from the first day of the
+        start expression to the last day of the end expression.
+
+Date expressions are anything `util.parse_date_range` understands.
+"""
+import asyncio
+import bisect
+import collections
+import datetime as dt
+import http
+import logging
+import os
+import urllib.parse
+
+from . import formatters, storage, util
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MarkdownCache():
+    """LRU cache of markdown entries, keyed by date and month file mtime.
+
+    A cached entry is used until RedNotebook saves its month file again, so
+    repeated requests neither parse YAML nor format entries. The dates of
+    each month's entries are kept as well, so only the days with entries are
+    looked up, however long the requested range is.
+    """
+
+    DEFAULT_MAX_ENTRIES = 4096
+
+    def __init__(self, data_path, max_entries=DEFAULT_MAX_ENTRIES):
+        self._data_path = data_path
+        self._max_entries = max_entries
+        # Maps (date, mtime_ns) to the markdown entry.
+        self._md_entries = collections.OrderedDict()
+        # Maps the paths of month files to their mtime_ns, and the sorted
+        # dates of their entries.
+        self._entry_dates = {}
+
+    def get_entries(self, start, end):
+        """Returns the markdown entries from start to end, inclusive."""
+        md_entries = []
+        for month_date, month_path in storage.find_month_files(
+                self._data_path):
+            if start.replace(day=1) <= month_date <= end:
+                md_entries.extend(self._get_month_entries(
+                    month_date, month_path, start, end))
+        while len(self._md_entries) > self._max_entries:
+            self._md_entries.popitem(last=False)
+        return md_entries
+
+    def _get_month_entries(self, month_date, month_path, start, end):
+        """Returns the month file's markdown entries from start to end.
+
+        A month file which RedNotebook deletes or replaces meanwhile has no
+        entries, or only those still in it when it is loaded.
+        """
+        try:
+            mtime_ns = os.stat(month_path).st_mtime_ns
+            rn_entries = {}
+            cached_mtime_ns, entry_dates = self._entry_dates.get(
+                month_path, (None, None))
+            if cached_mtime_ns != mtime_ns:
+                rn_entries = storage.load_month_entries(month_date, month_path)
+                entry_dates = sorted(
+                    date for date, rn_entry in rn_entries.items() if rn_entry)
+                self._entry_dates[month_path] = mtime_ns, entry_dates
+            dates = entry_dates[bisect.bisect_left(entry_dates, start):
+                                bisect.bisect_right(entry_dates, end)]
+            missing_dates = {
+                date for date in dates
+                if (date, mtime_ns) not in self._md_entries
+            }
+            if missing_dates and not rn_entries:
+                # Only the missing days are parsed, if few of the month's are.
+                rn_entries = storage.load_month_entries(
+                    month_date, month_path, dates=missing_dates)
+        except FileNotFoundError:
+            return []
+        md_entries = []
+        for date in dates:
+            key = date, mtime_ns
+            if key not in self._md_entries:
+                if not rn_entries.get(date):
+                    # The file changed since its mtime was read.
+                    continue
+                self._md_entries[key] = formatters.format_entry(
+                    rn_entries[date])
+            self._md_entries.move_to_end(key)
+            md_entries.append(self._md_entries[key])
+        return md_entries
+
+
+class MarkdownServer():
+    """Answers HTTP requests for entries with markdown."""
+
+    def __init__(self, data_path, workdays_only=False):
+        self._cache = MarkdownCache(data_path)
+        self._workdays_only = workdays_only
+
+    async def handle_connection(self, reader, writer):
+        """Answers the HTTP request read from reader, then disconnects."""
+        try:
+            request_line = await reader.readline()
+            # The headers are read, but none of them are needed.
+            while (await reader.readline()).strip():
+                pass
+            try:
+                status, body = self.respond(request_line.decode('latin-1'))
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception('Could not answer %r', request_line)
+                status, body = http.HTTPStatus.INTERNAL_SERVER_ERROR, b''
+            writer.write(
+                f'HTTP/1.0 {status.value} {status.phrase}\r\n'
+                f'Content-Type: text/markdown; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: close\r\n\r\n'.encode('latin-1') + body)
+            await writer.drain()
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    def respond(self, request_line):
+        """Returns the status and body of the response to request_line."""
+        try:
+            method, target, unused_version = request_line.split()
+        except ValueError:
+            return http.HTTPStatus.BAD_REQUEST, b''
+        if method != 'GET':
+            return http.HTTPStatus.METHOD_NOT_ALLOWED, b''
+        try:
+            start, end = self.parse_target(target)
+        except KeyError:
+            return http.HTTPStatus.NOT_FOUND, b''
+        except ValueError as error:
+            return http.HTTPStatus.BAD_REQUEST, f'{error}\n'.encode('utf-8')
+        md_entries = self._cache.get_entries(start, end)
+        body = formatters.ENTRY_SEP.join(md_entries) + '\n'
+        return http.HTTPStatus.OK, body.encode('utf-8')
+
+    def parse_target(self, target):
+        """Returns the first and last dates requested by an HTTP target.
+
+        Raises:
+            KeyError: the target's path is not known.
+            ValueError: the dates in the target could not be parsed.
+        """
+        url = urllib.parse.urlsplit(target)
+        route, _, path_arg = url.path.lstrip('/').partition('/')
+        path_arg = urllib.parse.unquote(path_arg)
+        if route == 'date' and path_arg:
+            date = dt.date.fromisoformat(path_arg)
+            return date, date
+        if route == 'week' and path_arg:
+            if 'week' not in path_arg:
+                path_arg = f'week of {path_arg}'
+            return self._parse_interval(path_arg)
+        if route == 'range' and not path_arg:
+            query = urllib.parse.parse_qs(url.query)
+            if 'start' not in query or 'end' not in query:
+                raise ValueError('range requires start and end parameters')
+            start, _ = self._parse_interval(query['start'][0])
+            _, end = self._parse_interval(query['end'][0])
+            return start, end
+        raise KeyError(url.path)
+
+    def _parse_interval(self, date_str):
+        """Parses date_str into an interval with the server's workday mode."""
+        return util.parse_date_range(
+            date_str, self._workdays_only, as_interval=True)
+
+
+async def serve_markdown(data_path, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                         workdays_only=False):
+    """Serves the markdown of the entries in data_path until cancelled."""
+    markdown_server = MarkdownServer(data_path, workdays_only)
+    server = await asyncio.start_server(
+        markdown_server.handle_connection, host, port)
+    async with server:
+        await server.serve_forever()
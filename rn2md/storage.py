@@ -1,40 +1,592 @@
 """Module for accessing existing RedNotebook data on a local computer."""
+import array
+import bisect
+import collections.abc
+import contextlib
 import datetime as dt
+import functools
+import itertools
+import json
+import mmap
 import os
+import re
+import threading
+import time
 
-import yaml
+from . import profiling
 
+# PyYAML, sqlite3 and logging are imported on first use, as importing them
+# takes longer than running rn2md on a day's entry from the cache.
 
-def load_rednotebook_entries(data_path):
-    """Extracts the Rednotebook-styled data found in the given path."""
+# Overrides the YAML loader picked by `yaml_backend` when set.
+_YAML_LOADER = None
+
+# Like RedNotebook, tags need a letter and may not follow a word, '&' or '#'.
+# Tags also may not follow a '/', so that url fragments are not tags.
+_TAG_PATTERN = re.compile(r'(?<![\w&#/])#(\w*[^\W\d_]\w*)')
+# Lines which start in the first column of a month file, other than comments,
+# found by their preceding newline. In a month file written by RedNotebook,
+# these are exactly the day keys.
+_TOP_LEVEL_LINE_PATTERN = re.compile(rb'\n[^\s#]')
+_DAY_KEY_PATTERN = re.compile(rb'([0-9]{1,2}):(?:[ \t]|\r?\n|\Z)')
+# Names of month files, YYYY-MM with an optional extension. Months may have a
+# single digit, like they may for strptime's %m.
+_MONTH_FILENAME_PATTERN = re.compile(
+    r'(?!0000)([0-9]{4})-(1[0-2]|0?[1-9])(?:\.[^.]*)?')
+# Month files are loaded by this many threads at most, so reading one month
+# file overlaps with reading and parsing the others.
+_MAX_LOAD_THREADS = 8
+
+
+class EntryCache():
+    """Persists parsed month files so unchanged ones are not parsed again.
+
+    Entries are keyed by the month file's path, and are only considered valid
+    while the file's mtime and size stay the same. Once the cache grows beyond
+    `max_size` bytes, the least-recently used month files are evicted. The
+    cache may be shared by threads.
+
+    Cache hits do not write to the database. When a hit's last use is older
+    than `TOUCH_INTERVAL_NS`, its new last use is written once the cache is
+    closed or a month file is stored, whichever comes first.
+
+    Errors of the database while the cache is in use are logged, and treated
+    like misses.
+
+    Raises:
+        OSError: the cache's directory could not be created.
+        sqlite3.Error: the cache's database could not be opened.
+    """
+
+    DEFAULT_CACHE_PATH = os.path.expanduser('~/.cache/rn2md/entries.sqlite3')
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+    TOUCH_INTERVAL_NS = 60 * 60 * 1_000_000_000
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH,
+                 max_size=DEFAULT_MAX_SIZE):
+        if cache_path != ':memory:':
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self._max_size = max_size
+        import sqlite3  # pylint: disable=import-outside-toplevel
+        self._db_error = sqlite3.Error
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        # Maps the paths of month files to their last use, until written.
+        self._touched = {}
+        try:
+            with self._db:
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS month_files ('
+                    '    path TEXT PRIMARY KEY,'
+                    '    mtime_ns INTEGER NOT NULL,'
+                    '    size INTEGER NOT NULL,'
+                    '    entries BLOB NOT NULL,'
+                    '    last_used INTEGER NOT NULL)')
+        except sqlite3.Error:
+            self._db.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_exc_info):
+        self.close()
+
+    def close(self):
+        """Writes the pending last uses, and closes the database connection."""
+        with self._lock:
+            try:
+                with self._db:
+                    self._write_touched()
+            except self._db_error as error:
+                _logger().warning('Could not update the cache: %s', error)
+            self._db.close()
+
+    def get(self, month_path, month_stat):
+        """Returns the cached entries of the month file, or None on a miss."""
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    'SELECT entries, last_used FROM month_files '
+                    'WHERE path = ? AND mtime_ns = ? AND size = ?',
+                    (month_path, month_stat.st_mtime_ns, month_stat.st_size),
+                ).fetchone()
+            except self._db_error as error:
+                _logger().warning('Could not read the cache: %s', error)
+                return None
+            if row is None:
+                return None
+            blob, last_used = row
+            now = time.time_ns()
+            if now - last_used > self.TOUCH_INTERVAL_NS:
+                self._touched[month_path] = now
+        return {
+            dt.date.fromordinal(ordinal): entry
+            for ordinal, entry in json.loads(blob)
+        }
+
+    def put(self, month_path, month_stat, entries):
+        """Stores the entries parsed from the month file."""
+        blob = json.dumps(
+            [[date.toordinal(), entry] for date, entry in entries.items()],
+            ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO month_files '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (month_path, month_stat.st_mtime_ns,
+                         month_stat.st_size, blob, time.time_ns()))
+                    self._write_touched()
+                    self._evict()
+            except self._db_error as error:
+                _logger().warning('Could not update the cache: %s', error)
+
+    def _write_touched(self):
+        """Writes the last uses of the month files read since last written."""
+        if self._touched:
+            self._db.executemany(
+                'UPDATE month_files SET last_used = ? WHERE path = ?',
+                [(used, path) for path, used in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self):
+        """Drops least-recently used month files until within max_size."""
+        rows = self._db.execute(
+            'SELECT path, length(entries) FROM month_files '
+            'ORDER BY last_used DESC').fetchall()
+        total_size = 0
+        for path, size in rows:
+            total_size += size
+            if total_size > self._max_size:
+                self._db.execute(
+                    'DELETE FROM month_files WHERE path = ?', (path,))
+
+
+class CompactEntries(collections.abc.Mapping):
+    """Read-only mapping of dates to entries which uses little memory.
+
+    Rather than keeping a date object and a str object for every entry, dates
+    are kept as ordinals in a sorted array and the entries are concatenated
+    into a single UTF-8 buffer, indexed by an array of offsets. Entries are
+    decoded when they are looked up.
+
+    Use `from_months` to build the store one month at a time, so that the
+    entries of the whole journal are never held as str objects at once.
+    """
+
+    def __init__(self, entries=()):
+        self._ordinals = array.array('l')
+        self._offsets = array.array('q', [0])
+        self._buffer = bytearray()
+        self._extend(dict(entries))
+
+    @classmethod
+    def from_months(cls, months):
+        """Returns the store of the entries of every month.
+
+        Args:
+            months: iterable of mappings from dates to entries, one for each
+                month, in the order of the months.
+
+        Raises:
+            ValueError: a month has dates before those of an earlier one.
+        """
+        compact_entries = cls()
+        for month_entries in months:
+            compact_entries._extend(month_entries)
+        return compact_entries
+
+    def _extend(self, entries):
+        """Appends the entries, which must follow the ones already held."""
+        items = sorted(entries.items())
+        if items and self._ordinals and (
+                items[0][0].toordinal() <= self._ordinals[-1]):
+            raise ValueError('entries must be added in the order of dates')
+        for date, entry in items:
+            self._ordinals.append(date.toordinal())
+            self._buffer += entry.encode('utf-8')
+            self._offsets.append(len(self._buffer))
+
+    def _index(self, date):
+        """Returns the index of the date's entry, or -1 if there is none."""
+        try:
+            ordinal = date.toordinal()
+        except AttributeError:
+            return -1
+        i = bisect.bisect_left(self._ordinals, ordinal)
+        if i < len(self._ordinals) and self._ordinals[i] == ordinal:
+            return i
+        return -1
+
+    def range(self, start=None, end=None):
+        """Yields the (date, entry) pairs from start to end, inclusive.
+
+        Either bound may be None to leave that side of the range open. The
+        cost depends on the number of entries in the range, rather than on
+        the number of days between start and end.
+        """
+        lo = 0 if start is None else bisect.bisect_left(
+            self._ordinals, start.toordinal())
+        hi = len(self._ordinals) if end is None else bisect.bisect_right(
+            self._ordinals, end.toordinal())
+        for i in range(lo, hi):
+            yield dt.date.fromordinal(self._ordinals[i]), self._entry(i)
+
+    def _entry(self, i):
+        """Returns the decoded entry at the given index."""
+        return self._buffer[self._offsets[i]:self._offsets[i + 1]].decode(
+            'utf-8')
+
+    def __getitem__(self, date):
+        i = self._index(date)
+        if i < 0:
+            raise KeyError(date)
+        return self._entry(i)
+
+    def __contains__(self, date):
+        return self._index(date) >= 0
+
+    def __iter__(self):
+        return map(dt.date.fromordinal, self._ordinals)
+
+    def __len__(self):
+        return len(self._ordinals)
+
+
+def load_rednotebook_entries(data_path, date_range=None, cache=None,
+                             tags=None):
+    """Extracts the Rednotebook-styled data found in the given path.
+
+    Args:
+        data_path: directory holding RedNotebook's YYYY-MM.txt month files.
+        date_range: optional iterable of dates. When provided, only the month
+            files which overlap with it are parsed, and only the entries on
+            its dates are returned.
+        cache: optional EntryCache used to skip parsing unchanged month files.
+        tags: optional dict which is filled with every #tag used by the
+            loaded entries, mapped to the sorted dates of those entries.
+
+    Returns:
+        dict mapping datetime.date objects to their entry's text.
+    """
     rednotebook = {}
-    for month_date, month_path in _load_month_paths(data_path):
-        with open(month_path, encoding='utf-8') as month_file:
-            rednotebook.update(_load_daily_entries(month_date, month_file))
+    for entries in iter_month_entries(data_path, date_range, cache, tags):
+        rednotebook.update(entries)
     return rednotebook
 
 
+def iter_month_entries(data_path, date_range=None, cache=None, tags=None):
+    """Yields the entries of each month file, in the order of the months.
+
+    Takes the same arguments as `load_rednotebook_entries`, but only holds
+    a few months' entries at once. The entries of files for the same month,
+    such as `2018-03.txt` and an editor's `2018-03.txt~` backup, are merged
+    and yielded together. The tags are sorted once every month has been
+    yielded.
+    """
+    dates = None if date_range is None else set(date_range)
+    month_files = find_month_files(data_path, dates)
+    loaded_months = itertools.groupby(
+        zip(month_files, _load_months(month_files, cache, dates)),
+        key=lambda loaded_month: loaded_month[0][0])
+    for unused_month_date, month_group in loaded_months:
+        entries = {}
+        for unused_month_file, month_entries in month_group:
+            entries.update(month_entries)
+        if tags is not None:
+            for date, entry in entries.items():
+                for tag in extract_tags(entry):
+                    tags.setdefault(tag, []).append(date)
+        yield entries
+    for tagged_dates in (tags or {}).values():
+        tagged_dates.sort()
+
+
+def _load_months(month_files, cache, dates):
+    """Yields the entries of the month files, in the order of month_files.
+
+    Several month files are loaded at once by a bounded pool of threads, so
+    loading many months is not bound by the latency of every single read.
+    """
+    if len(month_files) < 2:
+        for month_date, month_path in month_files:
+            yield load_month_entries(month_date, month_path, cache, dates)
+        return
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+    with concurrent.futures.ThreadPoolExecutor(
+            min(_MAX_LOAD_THREADS, len(month_files))) as executor:
+        yield from executor.map(
+            lambda month_file: load_month_entries(*month_file, cache, dates),
+            month_files)
+
+
+def extract_tags(entry):
+    """Returns the lowercase names of the #tags used by the entry."""
+    if '#' not in entry:
+        return set()
+    return {tag.lower() for tag in _TAG_PATTERN.findall(entry)}
+
+
+@profiling.profiled('storage.scan')
+def find_month_files(data_path, date_range=None):
+    """Returns (month date, path) pairs of the month files in data_path.
+
+    The pairs are sorted by month, whatever order the directory lists them in.
+
+    Args:
+        data_path: directory holding RedNotebook's YYYY-MM.txt month files.
+        date_range: optional iterable of dates. When provided, only the month
+            files which overlap with it are returned.
+    """
+    month_paths = sorted(_load_month_paths(data_path))
+    if date_range is None:
+        return list(month_paths)
+    months = {date.replace(day=1) for date in date_range}
+    return [(m, p) for m, p in month_paths if m in months]
+
+
+def _month_file_size(
+        unused_month_date, month_path, unused_cache=None, unused_dates=None):
+    """Returns the size of the month file load_month_entries is called with."""
+    return os.path.getsize(month_path)
+
+
+@profiling.profiled('storage.load', num_bytes=_month_file_size)
+def load_month_entries(month_date, month_path, cache=None, dates=None):
+    """Returns the month file's daily entries, consulting the cache first.
+
+    When a collection of dates is given, only the entries on those dates are
+    returned. Without a cache, the other days are skipped over while parsing.
+    """
+    if cache is None:
+        if dates is not None:
+            entries = _load_entries_by_day(month_date, month_path, dates)
+            if entries is not None:
+                return entries
+        with open(month_path, encoding='utf-8') as month_file:
+            return _load_daily_entries(month_date, month_file, dates)
+    month_stat = os.stat(month_path)
+    entries = cache.get(month_path, month_stat)
+    if entries is None:
+        # The cache holds entire months, so every day has to be parsed.
+        with open(month_path, encoding='utf-8') as month_file:
+            entries = _load_daily_entries(month_date, month_file)
+        cache.put(month_path, month_stat, entries)
+    if dates is None:
+        return entries
+    return {date: entry for date, entry in entries.items() if date in dates}
+
+
 def _load_month_paths(data_path):
     """Returns files from the data_path which contain RedNotebook data."""
     for item in os.scandir(data_path):
-        if not item.is_file():
-            continue
-        file_root, unused_ext = os.path.splitext(item.name)
-        try:
-            month_date = dt.datetime.strptime(file_root, '%Y-%m').date()
-        except ValueError:
+        # Checking the name first saves a stat of most files which aren't.
+        month_match = _MONTH_FILENAME_PATTERN.fullmatch(item.name)
+        if month_match is None or not item.is_file():
             continue
-        else:
-            yield (month_date, item.path)
+        year, month = month_match.groups()
+        yield (dt.date(int(year), int(month), 1), item.path)
+
+
+@functools.lru_cache(maxsize=None)
+def _default_yaml_loader():
+    """Returns the fastest YAML loader PyYAML was built with."""
+    import yaml  # pylint: disable=import-outside-toplevel
+    try:
+        return yaml.CSafeLoader
+    except AttributeError:
+        # PyYAML was built without libyaml, so use its pure-Python loader.
+        return yaml.SafeLoader
 
 
-def _load_daily_entries(month_date, month_file):
+def yaml_backend():
+    """Returns 'libyaml' or 'python', whichever month files are parsed with."""
+    loader = _YAML_LOADER or _default_yaml_loader()
+    # PyYAML prefixes the names of its libyaml-based loaders with a C.
+    return 'libyaml' if loader.__name__.startswith('C') else 'python'
+
+
+@functools.lru_cache(maxsize=None)
+def _logger():
+    """Returns the logger of this module, importing logging on first use."""
+    import logging  # pylint: disable=import-outside-toplevel
+    return logging.getLogger(__name__)
+
+
+@profiling.profiled('storage.parse')
+def _load_daily_entries(month_date, month_file, dates=None):
     """Returns mapping of the month file's daily entries as strings."""
-    month_file_content = yaml.safe_load(month_file)
-    if not isinstance(month_file_content, dict):
+    _logger().debug('Parsing %r with the %s YAML backend',
+                  getattr(month_file, 'name', month_file), yaml_backend())
+    return dict(iter_daily_entries(month_date, month_file, dates))
+
+
+@profiling.profiled('storage.parse_days')
+def _load_entries_by_day(month_date, month_path, dates):
+    """Parses only the days of the month file which are in dates.
+
+    Each day is found through the month file's index of day offsets, and only
+    its slice of the memory-mapped file is decoded and parsed.
+
+    Returns:
+        mapping of the wanted days' entries, or None if the month file can
+        not be indexed, or so many of its days are wanted that it is cheaper
+        to parse all of it.
+    """
+    month_stat = os.stat(month_path)
+    day_offsets = _day_offsets(
+        month_path, month_stat.st_mtime_ns, month_stat.st_size)
+    if day_offsets is None:
+        return None
+    wanted_spans = {
+        date: day_offsets[date.day] for date in dates
+        if date.replace(day=1) == month_date and date.day in day_offsets
+    }
+    if len(wanted_spans) * 2 > len(day_offsets):
+        return None
+    import yaml  # pylint: disable=import-outside-toplevel
+    entries = {}
+    with _map_month_file(month_path) as month_map:
+        for date, (start, end) in sorted(wanted_spans.items()):
+            day_yaml = month_map[start:end].decode('utf-8')
+            try:
+                entries.update(
+                    iter_daily_entries(month_date, day_yaml, dates={date}))
+            except yaml.YAMLError:
+                # A day key was found inside of another day's text.
+                return None
+    return entries
+
+
+@functools.lru_cache(maxsize=256)
+def _day_offsets(month_path, unused_mtime_ns, size):
+    """Returns the byte span of every day in the month file.
+
+    The index is cached for as long as the month file's mtime and size stay
+    the same, so they are part of the arguments.
+
+    Returns:
+        dict mapping days of the month to the (start, end) byte offsets of
+        their YAML, or None if the month file is not a block mapping of days.
+    """
+    if not size:
         return {}
-    return {
-        month_date.replace(day=day): entry
-        for day, day_content in month_file_content.items()
-        if (entry := day_content['text'].rstrip())
+    with _map_month_file(month_path) as month_map:
+        day_starts = _find_day_starts(month_map)
+    if day_starts is None:
+        return None
+    day_ends = [start for _, start in day_starts[1:]] + [size]
+    day_offsets = {
+        day: (start, end)
+        for (day, start), end in zip(day_starts, day_ends)
     }
+    if len(day_offsets) != len(day_starts):
+        # Some day is listed twice, so its YAML is not within one span.
+        return None
+    return day_offsets
+
+
+def _find_day_starts(month_bytes):
+    """Returns the (day, offset) of every top-level key of a month file.
+
+    Returns:
+        list of the days and the offsets of their keys, in file order, or None
+        if any top-level line of month_bytes is not a day key.
+    """
+    line_starts = [
+        line.start() + 1
+        for line in _TOP_LEVEL_LINE_PATTERN.finditer(month_bytes)
+    ]
+    if month_bytes[:1] not in b' \t\r\n#':
+        line_starts.insert(0, 0)
+    day_starts = []
+    for line_start in line_starts:
+        day_key = _DAY_KEY_PATTERN.match(month_bytes, line_start)
+        if day_key is None:
+            return None
+        day_starts.append((int(day_key.group(1)), line_start))
+    return day_starts
+
+
+@contextlib.contextmanager
+def _map_month_file(month_path):
+    """Memory-maps the month file, so slices of it are read on demand.
+
+    File systems which can not map files get the whole file's bytes instead.
+    """
+    with open(month_path, 'rb') as month_file:
+        try:
+            month_map = mmap.mmap(
+                month_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            yield month_file.read()
+            return
+        with month_map:
+            yield month_map
+
+
+def iter_daily_entries(month_date, month_file, dates=None):
+    """Yields the (date, text) pairs of the month file's non-empty entries.
+
+    Rather than loading the entire month file, its YAML event stream is read
+    one day at a time. Only the text of the current day is kept, and every
+    other key of a day is skipped over.
+
+    Args:
+        month_date: the first day of the month file's month.
+        month_file: file, or string, holding the month file's YAML.
+        dates: optional collection of dates. When provided, the days which
+            are not in it are skipped over as well.
+    """
+    import yaml  # pylint: disable=import-outside-toplevel
+    events = yaml.parse(
+        month_file, Loader=_YAML_LOADER or _default_yaml_loader())
+    for event in events:
+        if isinstance(event, yaml.MappingStartEvent):
+            break
+        if isinstance(event, yaml.NodeEvent):
+            # The month file does not map days to their content.
+            return
+    for day_event in events:
+        if isinstance(day_event, yaml.MappingEndEvent):
+            return
+        content_event = next(events)
+        date = None
+        if isinstance(day_event, yaml.ScalarEvent) and (
+                day_event.value.isdigit()):
+            date = month_date.replace(day=int(day_event.value))
+        if (date is None or (dates is not None and date not in dates) or
+                not isinstance(content_event, yaml.MappingStartEvent)):
+            _skip_yaml_node(day_event, events)
+            _skip_yaml_node(content_event, events)
+            continue
+        text = ''
+        for key_event in events:
+            if isinstance(key_event, yaml.MappingEndEvent):
+                break
+            value_event = next(events)
+            if (isinstance(key_event, yaml.ScalarEvent) and
+                    key_event.value == 'text' and
+                    isinstance(value_event, yaml.ScalarEvent)):
+                text = value_event.value
+            else:
+                _skip_yaml_node(key_event, events)
+                _skip_yaml_node(value_event, events)
+        if (entry := text.rstrip()):
+            yield date, entry
+
+
+def _skip_yaml_node(start_event, events):
+    """Consumes the events of the node which start_event starts."""
+    import yaml  # pylint: disable=import-outside-toplevel
+    if not isinstance(start_event, yaml.CollectionStartEvent):
+        return
+    depth = 1
+    while depth:
+        event = next(events)
+        if isinstance(event, yaml.CollectionStartEvent):
+            depth += 1
+        elif isinstance(event, yaml.CollectionEndEvent):
+            depth -= 1
@@ -2,9 +2,7 @@
 import enum
 import datetime as dt
 import functools
-
-import isoweek
-import parsedatetime as pdt
+import re
 
 
 def prime_coroutine_generator(coroutine_generator):
@@ -20,31 +18,49 @@ def prime_coroutine_generator(coroutine_generator):
 _Weekdays = (  # pylint: disable=invalid-name
     enum.Enum('_Weekdays', 'Mon Tue Wed Thu Fri Sat Sun', start=0))
 
+_RELATIVE_DAYS = {
+    'today': dt.timedelta(days=0),
+    'yesterday': dt.timedelta(days=-1),
+    'tomorrow': dt.timedelta(days=1),
+    'this week': dt.timedelta(weeks=0),
+    'last week': dt.timedelta(weeks=-1),
+    'next week': dt.timedelta(weeks=1),
+}
+_ISO_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+_STRICT_DATE_PATTERN = re.compile(
+    r'(?:[A-Za-z]{3} )?[A-Za-z]{3} \d{1,2}, \d{4}')
+
 
-def parse_date_range(date_str, workdays_only=False):
+def parse_date_range(date_str, workdays_only=False, as_interval=False):
     """Returns the dates interpreted from the given string.
 
     Args:
         date_str: A string parseable by parsedatetime.
         workdays_only: Whether to return only workdays (Mon-Fri)
+        as_interval: Whether to return the first and last date instead of
+            every date. The dates are always consecutive.
 
     Returns:
-        List of datetime.date objects interpreted from the string.
+        List of datetime.date objects interpreted from the string, or the
+        (start, end) pair of the first and last of them.
 
     Raises:
         ValueError: date_str could not be parsed.
     """
-    noon_tuple = dt.datetime.today().replace(hour=12).timetuple()
-    # I use "today at noon" as the source-time for `parsedatetime` to avoid
-    # rounding errors in unit tests. Without it, date arithmetic is 1-day off.
-    # This does not effect actual usage because RedNotebook can only be indexed
-    # by DD-MM-YYYY anyway; HH-MM-SS gets ignored.
-    parsed_time_struct, result = pdt.Calendar().parse(date_str, noon_tuple)
-    if not result:
-        raise ValueError(f'{date_str} could not be parsed into a date')
-    parsed_date = dt.datetime(*parsed_time_struct[:6]).date()
+    parsed_date = _parse_common_date(date_str)
+    if parsed_date is None:
+        noon_tuple = dt.datetime.today().replace(hour=12).timetuple()
+        # I use "today at noon" as the source-time for `parsedatetime` to
+        # avoid rounding errors in unit tests. Without it, date arithmetic is
+        # 1-day off. This does not effect actual usage because RedNotebook can
+        # only be indexed by DD-MM-YYYY anyway; HH-MM-SS gets ignored.
+        parsed_time_struct, result = _calendar().parse(date_str, noon_tuple)
+        if not result:
+            raise ValueError(f'{date_str} could not be parsed into a date')
+        parsed_date = dt.datetime(*parsed_time_struct[:6]).date()
     get_days = _get_week_days if 'week' in date_str else _get_single_day
-    return get_days(parsed_date, workdays_only)
+    days = get_days(parsed_date, workdays_only)
+    return (days[0], days[-1]) if as_interval else days
 
 
 def strict_parse_date(date_str):
@@ -92,6 +108,41 @@ def strict_parse_date(date_str):
                      f'[{fmt_with_dow!r}, {fmt_without_dow!r}])')
 
 
+def _parse_common_date(date_str):
+    """Parses the most common forms of date_str without parsedatetime.
+
+    Handles relative days and weeks such as 'today' or 'last week', ISO dates,
+    and the formats of `strict_parse_date`, each optionally preceded by
+    'week of'. These give the same date parsedatetime would.
+
+    Returns:
+        The parsed datetime.date, or None if date_str has any other form.
+    """
+    date_str = ' '.join(date_str.split())
+    if date_str.lower().startswith('week of '):
+        date_str = date_str[len('week of '):]
+    relative_days = _RELATIVE_DAYS.get(date_str.lower())
+    if relative_days is not None:
+        return dt.date.today() + relative_days
+    try:
+        if _ISO_DATE_PATTERN.fullmatch(date_str):
+            return dt.date.fromisoformat(date_str)
+        if _STRICT_DATE_PATTERN.fullmatch(date_str):
+            return strict_parse_date(date_str)
+    except ValueError:
+        # Leave invalid dates and mismatched weekdays to parsedatetime.
+        pass
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _calendar():
+    """Returns the parsedatetime calendar shared by all parses."""
+    # parsedatetime is slow to import, and most rn2md runs never need it.
+    import parsedatetime as pdt  # pylint: disable=import-outside-toplevel
+    return pdt.Calendar()
+
+
 def _get_week_days(date, workdays_only):
     """Expand date to the surrounding days in that week.
 
@@ -102,8 +153,10 @@ def _get_week_days(date, workdays_only):
     Returns:
         list of date objects that fall in the week of given date.
     """
-    week_number = date.isocalendar()[1]
-    week = isoweek.Week(date.year, week_number).days()
+    import isoweek  # pylint: disable=import-outside-toplevel
+    # The ISO year differs from date.year for days around new year.
+    iso_year, week_number, unused_weekday = date.isocalendar()
+    week = isoweek.Week(iso_year, week_number).days()
     return week[:5] if workdays_only else week
 
 
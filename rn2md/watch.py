@@ -0,0 +1,85 @@
+"""Watches RedNotebook's data directory for changes to its month files.
+
+Changes are detected with inotify when the optional `inotify_simple` package
+is installed. Otherwise, the data directory is polled.
+"""
+import os
+import time
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+from . import storage
+
+
+class MonthFileWatcher():
+    """Reports the month files which were created, modified or deleted."""
+
+    def __init__(self, data_path, poll_interval=1.0):
+        self._data_path = data_path
+        self._poll_interval = poll_interval
+        self._inotify = None
+        if inotify_simple is not None:
+            self._inotify = inotify_simple.INotify()
+            flags = inotify_simple.flags
+            self._inotify.add_watch(
+                data_path, flags.CLOSE_WRITE | flags.CREATE | flags.DELETE |
+                flags.MOVED_FROM | flags.MOVED_TO)
+        self._month_stats = self._stat_month_files()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused_exc_info):
+        self.close()
+
+    def close(self):
+        """Stops watching the data directory."""
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def poll(self):
+        """Returns the month files which changed since the previous call.
+
+        Returns:
+            dict mapping the month date of every changed month file to its
+            path, or to None if the month file was deleted.
+        """
+        month_stats = self._stat_month_files()
+        changes = {
+            month_date: month_path
+            for month_date, (month_path, month_stat) in month_stats.items()
+            if self._month_stats.get(month_date) != (month_path, month_stat)
+        }
+        changes.update(dict.fromkeys(self._month_stats.keys() - month_stats))
+        self._month_stats = month_stats
+        return changes
+
+    def wait(self):
+        """Blocks until month files change, and returns them like poll()."""
+        while True:
+            if self._inotify is not None:
+                # Give RedNotebook a moment to finish writing all of its files.
+                self._inotify.read(read_delay=100)
+            else:
+                time.sleep(self._poll_interval)
+            changes = self.poll()
+            if changes:
+                return changes
+
+    def _stat_month_files(self):
+        """Returns the path, mtime and size of every month file."""
+        month_stats = {}
+        month_files = storage.find_month_files(self._data_path)
+        for month_date, month_path in month_files:
+            try:
+                month_stat = os.stat(month_path)
+            except FileNotFoundError:
+                # Deleted since the directory was listed, e.g. while
+                # RedNotebook replaces it, so it is reported as deleted.
+                continue
+            month_stats[month_date] = (
+                month_path, (month_stat.st_mtime_ns, month_stat.st_size))
+        return month_stats
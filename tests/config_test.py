@@ -1,6 +1,7 @@
 """Test cases for the rn2md.config module."""
 import os
 import unittest
+from unittest import mock
 
 from pyfakefs import fake_filesystem_unittest
 import freezegun
@@ -27,6 +28,53 @@ class OptionsTest(fake_filesystem_unittest.TestCase):
                          [util.strict_parse_date('Mon Mar 26, 2018')])
         self.assertEqual(remaining_argv, ['command', 'line', 'args'])
 
+    def test_output_flag(self):
+        """Tests the output path can be set from the command line."""
+        argv = ['rn2md', '--output', '/out.md', 'last', 'week']
+        options, remaining_argv = config.Options.from_argv(argv)
+        self.assertEqual(options.output_path, '/out.md')
+        self.assertEqual(remaining_argv, ['last', 'week'])
+
+    def test_jobs_flag(self):
+        """Tests the number of export processes can be set from the argv."""
+        options, unused_remaining_argv = config.Options.from_argv(
+            ['rn2md', '--jobs', '4'])
+        self.assertEqual(options.jobs, 4)
+
+    def test_watch_flag(self):
+        """Tests that watch mode is off unless it is requested."""
+        options, unused_remaining_argv = config.Options.from_argv(['rn2md'])
+        self.assertFalse(options.watch)
+        options, unused_remaining_argv = config.Options.from_argv(
+            ['rn2md', '--watch'])
+        self.assertTrue(options.watch)
+
+    def test_profile_flags(self):
+        """Tests profiling is set up by flags or the environment variable."""
+        options, unused_remaining_argv = config.Options.from_argv(['rn2md'])
+        self.assertEqual(options.profile_path, '')
+        options, remaining_argv = config.Options.from_argv(
+            ['rn2md', '--profile', 'today'])
+        self.assertEqual(options.profile_path, '-')
+        self.assertEqual(remaining_argv, ['today'])
+        options, unused_remaining_argv = config.Options.from_argv(
+            ['rn2md', '--profile-json', '/stats.json'])
+        self.assertEqual(options.profile_path, '/stats.json')
+        with mock.patch.dict(os.environ, {'RN2MD_PROFILE': '1'}):
+            options, unused_remaining_argv = config.Options.from_argv(
+                ['rn2md'])
+            self.assertEqual(options.profile_path, '-')
+
+    def test_flags_take_precedence_over_config_file(self):
+        """Tests that command line flags override the config file."""
+        self.fs.create_file(os.path.expanduser('~/.rn2mdrc'), contents="""
+        [DEFAULT]
+        output path=/config.md
+        """)
+        options, unused_remaining_argv = config.Options.from_argv(
+            ['rn2md', '-o', '/flag.md'])
+        self.assertEqual(options.output_path, '/flag.md')
+
     def test_change_work_options(self):
         """Tests workday mode changes made in the config_options file."""
         self.fs.create_file(os.path.expanduser('~/.rn2mdrc'), contents="""
@@ -45,6 +93,15 @@ class OptionsTest(fake_filesystem_unittest.TestCase):
         options, unused_remaining_argv = config.Options.from_argv([])
         self.assertEqual(options.data_path, '/test')
 
+    def test_disable_cache(self):
+        """Test the parsed-entry cache can be disabled in the config file."""
+        self.fs.create_file(os.path.expanduser('~/.rn2mdrc'), contents="""
+        [DEFAULT]
+        cache path=
+        """)
+        options, unused_remaining_argv = config.Options.from_argv([])
+        self.assertFalse(options.cache_path)
+
     @freezegun.freeze_time(util.strict_parse_date('Mon Mar 26, 2018'))
     def test_change_default_date_range(self):
         """Test default date range changes made in the config file."""
@@ -0,0 +1,94 @@
+"""Test cases for the rn2md.export module."""
+import os
+import unittest
+from unittest import mock
+
+from pyfakefs import fake_filesystem_unittest
+
+from rn2md import export
+from rn2md import storage
+from tests import month_files
+
+
+class ExportMarkdownTreeTest(
+        month_files.MonthFilesMixin, fake_filesystem_unittest.TestCase):
+    """Test case for the export_markdown_tree function."""
+
+    def _read_output(self, md_name):
+        with open(os.path.join('/out', md_name), encoding='utf-8') as md_file:
+            return md_file.read()
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self._create_month_test_file('2018-02.txt', {28: '//february//'})
+        self._create_month_test_file('2018-03.txt', {1: '+ a', 24: 'info'})
+
+    def test_writes_one_file_per_day(self):
+        """Tests that each entry is formatted into its own file."""
+        written, deleted = export.export_markdown_tree('/data', '/out')
+
+        self.assertCountEqual(
+            written, ['2018-02-28.md', '2018-03-01.md', '2018-03-24.md'])
+        self.assertEqual(deleted, [])
+        self.assertEqual(self._read_output('2018-02-28.md'), '_february_\n')
+        self.assertEqual(self._read_output('2018-03-01.md'), '1. a\n')
+
+    def test_writes_one_file_per_month(self):
+        """Tests that entries can be grouped into one file per month."""
+        written, unused_deleted = export.export_markdown_tree(
+            '/data', '/out', layout='month')
+
+        self.assertCountEqual(written, ['2018-02.md', '2018-03.md'])
+        self.assertEqual(self._read_output('2018-03.md'), '1. a\n\n\ninfo\n')
+
+    def test_unchanged_months_are_skipped(self):
+        """Tests that a second export does not parse unchanged months."""
+        export.export_markdown_tree('/data', '/out')
+
+        with mock.patch.object(
+                storage, 'load_month_entries') as mock_load_month_entries:
+            written, deleted = export.export_markdown_tree('/data', '/out')
+
+        mock_load_month_entries.assert_not_called()
+        self.assertEqual((written, deleted), ([], []))
+
+    def test_changed_months_are_exported_again(self):
+        """Tests that only the changed month is exported again."""
+        export.export_markdown_tree('/data', '/out')
+        self._create_month_test_file('2018-03.txt', {1: '+ b', 2: 'new'})
+
+        written, deleted = export.export_markdown_tree('/data', '/out')
+
+        self.assertCountEqual(written, ['2018-03-01.md', '2018-03-02.md'])
+        self.assertEqual(deleted, ['2018-03-24.md'])
+        self.assertEqual(self._read_output('2018-03-01.md'), '1. b\n')
+        self.assertFalse(os.path.exists('/out/2018-03-24.md'))
+
+    def test_deleted_months_are_removed(self):
+        """Tests that outputs of deleted month files are removed."""
+        export.export_markdown_tree('/data', '/out')
+        self.fs.remove('/data/2018-02.txt')
+
+        written, deleted = export.export_markdown_tree('/data', '/out')
+
+        self.assertEqual((written, deleted), ([], ['2018-02-28.md']))
+
+    def test_changing_layout_replaces_outputs(self):
+        """Tests that outputs of the previous layout are removed."""
+        export.export_markdown_tree('/data', '/out')
+
+        written, deleted = export.export_markdown_tree(
+            '/data', '/out', layout='month')
+
+        self.assertCountEqual(written, ['2018-02.md', '2018-03.md'])
+        self.assertCountEqual(
+            deleted, ['2018-02-28.md', '2018-03-01.md', '2018-03-24.md'])
+
+    def test_invalid_layout(self):
+        """Tests that unknown layouts are rejected."""
+        with self.assertRaisesRegex(ValueError, 'not a valid layout'):
+            export.export_markdown_tree('/data', '/out', layout='year')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,6 +17,119 @@ class RednotebookToMarkdownFormatterTest(unittest.TestCase):
         with self.subTest():
             _ = formatters.format_rednotebook_as_markdown()
 
+    def test_same_output_as_staged_formatters(self):
+        """Tests the single-pass and staged formatters give the same output."""
+        lines = [
+            'Text with //italicized// content.',
+            '//italic1//, //italic2//, unused //',
+            'http://github.com/brianrodri',
+            '//italic//, `//escaped italic//`',
+            '[sample text ""go/somewhere""]',
+            '[""http://www.site.com/image.jpg""]',
+            '--text--',
+            '--a complete sentence.--',
+            '--changed--, --this too--, not here--or here.',
+            '[x ""http://do/some--weird--text""]',
+            '--hit--, `--not hit--`',
+            '-----',
+            '=Level One=',
+            '===Level Three===',
+            'Not at =start= of text',
+            '=' * 6,
+            '==Unbalanced===',
+            '+ A',
+            ' + B',
+            ' - B',
+            '',
+            '',
+            'Content',
+            '+ C',
+            'underscore_delimited_word',
+            '_with_trailing_underscores_',
+            '[test_thing ""http://github.com/test_thing""]',
+            'gets_escaped, `no_escape`',
+            '``code encoded stuff``',
+            '```py',
+            '# Python code',
+            '```',
+            '= //Padded// header with ``code_block``, [a_b ""c_d""] =',
+            '``a_b``, `//c//`//d//, --[e ""//f//""]--',
+            '[a ""http://b.c""] [d ""http://e.f""]',
+            'see [""a] [t ""u""]',
+            '[""x [t ""u""] y""] //z//',
+            '[""[""]+ ""]""//""]a`//+ ',
+        ]
+        for header_padding in (0, 2):
+            with self.subTest(header_padding=header_padding):
+                self.assertEqual(
+                    apply_formatter(
+                        formatters.format_rednotebook_as_markdown(
+                            header_padding=header_padding), lines),
+                    apply_formatter(
+                        formatters.format_rednotebook_as_markdown_in_stages(
+                            header_padding=header_padding), lines))
+
+    def test_stages_share_spans_of_unchanged_lines(self):
+        """Tests that a line is scanned for links once while unchanged."""
+        # pylint: disable=protected-access
+        formatter = formatters.format_rednotebook_as_markdown_in_stages()
+        formatters._link_url_spans.cache_clear()
+
+        self.assertEqual(
+            formatter.send('plain //unbalanced'), 'plain //unbalanced')
+        cache_info = formatters._link_url_spans.cache_info()
+        self.assertEqual((cache_info.misses, cache_info.hits), (1, 3))
+
+
+class MarkdownFormatterTest(unittest.TestCase):
+    """Test the reusable RedNotebook to markdown formatter."""
+
+    def test_same_output_as_coroutine(self):
+        """Tests the formatter agrees with format_rednotebook_as_markdown."""
+        lines = ['=Header=', '+ A', '', ' + B', '+ C', '//italic// x_y']
+        self.assertEqual(
+            apply_formatter(formatters.MarkdownFormatter(), lines),
+            apply_formatter(
+                formatters.format_rednotebook_as_markdown(), lines))
+
+    def test_reset_restarts_list_numbering(self):
+        """Tests that entries formatted after a reset start from scratch."""
+        formatter = formatters.MarkdownFormatter()
+        self.assertEqual(apply_formatter(formatter, ['+ A', '+ B']),
+                         ['1. A', '2. B'])
+        formatter.reset()
+        self.assertEqual(apply_formatter(formatter, ['+ C']), ['1. C'])
+
+    def test_list_numbering_continues_without_reset(self):
+        """Tests that list numbering is kept between lines until a reset."""
+        formatter = formatters.MarkdownFormatter()
+        self.assertEqual(apply_formatter(formatter, ['+ A', '', '+ B']),
+                         ['1. A', '', '2. B'])
+
+
+class FormatEntryTest(unittest.TestCase):
+    """Test formatting entire RedNotebook-style entries to markdown-style."""
+
+    def test_same_output_as_formatting_lines(self):
+        """Tests that entries are formatted like their individual lines."""
+        lines = ['=Header=  ', '+ A', '', ' + B ', '+ C', '//italic// x_y']
+        self.assertEqual(
+            formatters.format_entry('\n'.join(lines), header_padding=1),
+            '\n'.join(apply_formatter(
+                formatters.format_rednotebook_as_markdown(header_padding=1),
+                [line.rstrip() for line in lines])))
+
+    def test_plain_entries_are_only_stripped(self):
+        """Tests that entries without markup only lose trailing whitespace."""
+        self.assertEqual(formatters.format_entry('Plain text.  \nMore text\t'),
+                         'Plain text.\nMore text')
+
+    def test_each_entry_restarts_list_numbering(self):
+        """Tests that list numbering does not carry over between entries."""
+        self.assertEqual(
+            list(formatters.format_entries(['+ A\n+ B', '+ C', 'text'])),
+            ['1. A\n2. B', '1. C', 'text'])
+
 
 class ItalicFormatterTest(unittest.TestCase):
     """Test formatting Rednotebook-style italics to markdown-style."""
@@ -290,6 +403,13 @@ class InnerUnderscoreFormatterTest(unittest.TestCase):
             apply_formatter(formatter, ['gets_escaped, `no_escape`']),
             [r'gets\_escaped, `no_escape`'])
 
+    def test_many_underscores_between_backticks(self):
+        """Tests long lines alternating between escaped and backticked data."""
+        formatter = formatters.format_inner_underscores()
+        self.assertEqual(
+            apply_formatter(formatter, ['a_b `c_d` ' * 500]),
+            [r'a\_b `c_d` ' * 500])
+
 
 class CodeBlockFormatterTest(unittest.TestCase):
     """Test formatting Rednotebook-style code blocks to markdown-style."""
@@ -0,0 +1,278 @@
+"""Test cases for the rn2md.__main__ module."""
+# Imported eagerly: when first imported after a fake filesystem test, the
+# process pool's pipes end up on the fake filesystem.
+import concurrent.futures.process  # pylint: disable=unused-import
+import contextlib
+import datetime as dt
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from pyfakefs import fake_filesystem_unittest
+import yaml
+
+from rn2md import __main__ as rn2md_main
+from tests import month_files
+
+
+class MainTest(month_files.MonthFilesMixin, fake_filesystem_unittest.TestCase):
+    """Test cases for running the rn2md tool end-to-end."""
+
+    def _run_main(self, *args):
+        stdout = io.StringIO()
+        with mock.patch('sys.argv', ['rn2md', *args]):
+            with contextlib.redirect_stdout(stdout):
+                rn2md_main.main()
+        return stdout.getvalue()
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self.fs.create_file(os.path.expanduser('~/.rn2mdrc'), contents="""
+        [DEFAULT]
+        data path=/data
+        cache path=
+        """)
+        self._create_month_test_file('2018-03.txt', {
+            19: '//Monday//',
+            21: '+ Wednesday',
+            25: 'Sunday',
+        })
+
+    def test_prints_entries(self):
+        """Tests that the requested entries are printed to stdout."""
+        self.assertEqual(
+            self._run_main('Mar', '21,', '2018'), '1. Wednesday\n')
+
+    def test_separates_entries(self):
+        """Tests that entries of a date range are separated."""
+        self.assertEqual(
+            self._run_main('week', 'of', 'Mar', '21,', '2018'),
+            rn2md_main.ENTRY_SEP.join(['_Monday_', '1. Wednesday', 'Sunday'])
+            + '\n')
+
+    def test_writes_output_file(self):
+        """Tests that the markdown can be written to a file instead."""
+        self.assertEqual(
+            self._run_main('-o', '/out.md', 'Mar', '19,', '2018'), '')
+        with open('/out.md', encoding='utf-8') as output_file:
+            self.assertEqual(output_file.read(), '_Monday_\n')
+
+    def test_unusable_cache_is_skipped(self):
+        """Tests that commands work when the cache can't be opened."""
+        self.fs.create_file('/home-cache')
+        self.fs.remove(os.path.expanduser('~/.rn2mdrc'))
+        self.fs.create_file(os.path.expanduser('~/.rn2mdrc'), contents="""
+        [DEFAULT]
+        data path=/data
+        cache path=/home-cache/rn2md/entries.sqlite3
+        """)
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertEqual(
+                self._run_main('Mar', '21,', '2018'), '1. Wednesday\n')
+        self.assertIn('not using the cache', stderr.getvalue())
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertEqual(
+                self._run_main('search', 'wednesday'), '2018-03-21\n')
+        self.assertIn('not using the search index', stderr.getvalue())
+
+    def test_batch(self):
+        """Tests that the entries of every expression in a file are printed."""
+        self.fs.create_file('/queries.txt', contents=(
+            'Mar 19, 2018\n\nweek of Mar 21, 2018\nnot a date\n'))
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertEqual(
+                self._run_main('batch', '/queries.txt'),
+                '==> Mar 19, 2018 <==\n_Monday_\n\n'
+                '==> week of Mar 21, 2018 <==\n' +
+                rn2md_main.ENTRY_SEP.join(
+                    ['_Monday_', '1. Wednesday', 'Sunday']) + '\n\n'
+                '==> not a date <==\n\n')
+        self.assertIn('not a date could not be parsed', stderr.getvalue())
+
+    def test_batch_json(self):
+        """Tests that a JSON batch read from stdin is answered as JSON."""
+        queries = io.StringIO(json.dumps(['Mar 21, 2018', 'Mar 22, 2018']))
+        with mock.patch('sys.stdin', queries), mock.patch.object(
+                rn2md_main.storage, 'load_month_entries',
+                wraps=rn2md_main.storage.load_month_entries) as mock_load:
+            output = self._run_main('batch', '--json')
+        mock_load.assert_called_once()
+        self.assertEqual(json.loads(output), [
+            {'query': 'Mar 21, 2018', 'dates': ['2018-03-21'],
+             'entries': ['1. Wednesday']},
+            {'query': 'Mar 22, 2018', 'dates': ['2018-03-22'],
+             'entries': []},
+        ])
+
+    def test_batch_invalid_json(self):
+        """Tests that malformed JSON input exits with a message."""
+        for queries in ('["Mar 21, 2018",', '[1, 2]'):
+            with self.subTest(queries=queries), mock.patch(
+                    'sys.stdin', io.StringIO(queries)):
+                with self.assertRaisesRegex(SystemExit, 'rn2md: JSON input'):
+                    self._run_main('batch', '--json')
+
+    def test_tag_filter(self):
+        """Tests that only the entries using the tag are printed."""
+        self._create_month_test_file('2018-04.txt', {
+            2: 'at #work', 3: 'at home', 4: '+ more #Work'})
+
+        self.assertEqual(
+            self._run_main('--tag', 'work', 'week', 'of', 'Apr', '2,', '2018'),
+            rn2md_main.ENTRY_SEP.join(['at #work', '1. more #Work']) + '\n')
+        self.assertEqual(
+            self._run_main('-t', '#home', 'week', 'of', 'Apr', '2,', '2018'),
+            '\n')
+
+    def test_tag_filter_in_commands(self):
+        """Tests that the batch and search commands use the tag filter."""
+        self._create_month_test_file('2018-04.txt', {
+            2: 'at #work', 3: 'at home', 4: '+ more #Work'})
+        self.fs.create_file('/queries.txt', contents='week of Apr 2, 2018\n')
+
+        self.assertEqual(
+            self._run_main('--tag', 'work', 'batch', '/queries.txt'),
+            '==> week of Apr 2, 2018 <==\n' +
+            rn2md_main.ENTRY_SEP.join(['at #work', '1. more #Work']) +
+            '\n\n')
+        self.assertEqual(
+            self._run_main('--tag', 'work', 'search', 'at'), '2018-04-02\n')
+        self.assertEqual(
+            self._run_main('--tag', 'work', 'search', '--markdown', 'at'),
+            '==> 2018-04-02 <==\nat #work\n\n')
+
+    def test_search(self):
+        """Tests that the dates, or entries, using all words are printed."""
+        self.assertEqual(self._run_main('search', 'wednesday'), '2018-03-21\n')
+        self.assertEqual(
+            self._run_main('search', '--markdown', 'monday'),
+            '==> 2018-03-19 <==\n_Monday_\n\n')
+        self.assertEqual(self._run_main('search', 'monday', 'sunday'), '')
+
+    @mock.patch.object(rn2md_main.watch, 'inotify_simple', None)
+    def test_watch_prints_changed_entries(self):
+        """Tests that watch mode prints the entries again after changes."""
+        def save_and_stop(watcher):
+            if save_and_stop.saved:
+                raise KeyboardInterrupt
+            save_and_stop.saved = True
+            self.fs.remove('/data/2018-03.txt')
+            self._create_month_test_file('2018-03.txt', {19: 'Changed'})
+            return watcher.poll()
+        save_and_stop.saved = False
+
+        with mock.patch.object(rn2md_main.watch.MonthFileWatcher, 'wait',
+                               autospec=True, side_effect=save_and_stop):
+            self.assertEqual(
+                self._run_main('--watch', 'Mar', '19,', '2018'),
+                '_Monday_\nChanged\n')
+
+
+class RedNotebookTest(unittest.TestCase):
+    """Test cases for the RedNotebook class."""
+
+    def test_to_markdown(self):
+        """Tests that to_markdown formats the entries between its bounds."""
+        red_notebook = rn2md_main.RedNotebook({
+            dt.date(2018, 3, 24): 'a #tag',
+            dt.date(2018, 3, 25): 'untagged',
+            dt.date(2018, 3, 26): '#TAG //again//',
+        })
+        self.assertEqual(
+            list(red_notebook.to_markdown(dt.date(2018, 3, 25))),
+            ['untagged', '#TAG _again_'])
+        self.assertEqual(
+            list(red_notebook.to_markdown(
+                dt.date(2018, 3, 25), dt.date(2018, 3, 30), '#tag')),
+            ['#TAG _again_'])
+
+    def test_range(self):
+        """Tests that range yields the entries between its bounds in order."""
+        red_notebook = rn2md_main.RedNotebook({
+            dt.date(2019, 12, 31): 'before',
+            dt.date(2020, 6, 1): 'during',
+            dt.date(2020, 1, 1): 'first',
+        })
+        self.assertEqual(
+            list(red_notebook.range(
+                dt.date(2020, 1, 1), dt.date(2020, 12, 31))),
+            [(dt.date(2020, 1, 1), 'first'), (dt.date(2020, 6, 1), 'during')])
+
+
+class ToMarkdownInParallelTest(unittest.TestCase):
+    """Test cases for the to_markdown_in_parallel function."""
+
+    def setUp(self):
+        self.data_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_path)
+        for month in range(1, 4):
+            month_file_path = os.path.join(
+                self.data_path, f'2018-{month:02d}.txt')
+            with open(month_file_path, 'w', encoding='utf-8') as month_file:
+                yaml.dump({
+                    day: {'text': f'+ {month}/{day}\n+ x_y //{day}//'}
+                    for day in range(1, 29, month)
+                }, month_file)
+
+    def test_same_output_as_serial_export(self):
+        """Tests that the parallel export matches RedNotebook.to_markdown."""
+        date_range = [
+            dt.date(2018, 1, 15) + dt.timedelta(days=i) for i in range(60)
+        ]
+        red_notebook = rn2md_main.RedNotebook.from_file(self.data_path)
+        self.assertEqual(
+            list(rn2md_main.to_markdown_in_parallel(
+                self.data_path, date_range, jobs=2)),
+            list(red_notebook.to_markdown(date_range[0], date_range[-1])))
+
+
+class WriteEntriesTest(unittest.TestCase):
+    """Test cases for the write_entries function."""
+
+    def test_same_output_as_joining_entries(self):
+        """Tests the output is the same as printing the joined entries."""
+        for md_entries in ([], ['a'], ['a', 'b\nc', '']):
+            with self.subTest(md_entries=md_entries):
+                output_file = io.StringIO()
+                rn2md_main.write_entries(iter(md_entries), output_file)
+                self.assertEqual(
+                    output_file.getvalue(),
+                    rn2md_main.ENTRY_SEP.join(md_entries) + '\n')
+
+    def test_writes_entries_as_they_are_formatted(self):
+        """Tests that entries are written before later ones are formatted."""
+        output_file = io.StringIO()
+
+        def md_entries():
+            yield 'first'
+            self.assertEqual(output_file.getvalue(), 'first')
+            yield 'second'
+
+        rn2md_main.write_entries(md_entries(), output_file)
+        self.assertEqual(output_file.getvalue(),
+                         f'first{rn2md_main.ENTRY_SEP}second\n')
+
+
+class StartupTest(unittest.TestCase):
+    """Test case for the modules imported when rn2md starts."""
+
+    def test_heavy_dependencies_are_deferred(self):
+        """Tests that slow imports are left until they are needed."""
+        deferred_modules = [
+            'asyncio', 'calendar', 'concurrent.futures', 'defaultlist',
+            'isoweek', 'logging', 'parsedatetime', 'sqlite3', 'yaml']
+        imported_modules = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, rn2md.__main__; print(*sys.modules)'],
+            capture_output=True, text=True, check=True).stdout.split()
+        self.assertFalse(set(deferred_modules) & set(imported_modules))
+
+
+if __name__ == '__main__':
+    unittest.main()
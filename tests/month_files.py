@@ -0,0 +1,24 @@
+"""Writes RedNotebook month files for the test cases which need them."""
+import os
+
+import yaml
+
+
+class MonthFilesMixin():
+    """Mixin of test cases which create month files in their `data_path`."""
+
+    data_path = '/data'
+
+    def _create_month_test_file(self, month_filename, daily_entries):
+        """Writes a month file holding the given entry text of each day.
+
+        A month file which already exists is replaced, so its mtime changes.
+        """
+        month_file_path = os.path.join(self.data_path, month_filename)
+        if os.path.exists(month_file_path):
+            os.remove(month_file_path)
+        os.makedirs(self.data_path, exist_ok=True)
+        with open(month_file_path, 'w', encoding='utf-8') as month_file:
+            yaml.dump(
+                {day: {'text': entry} for day, entry in daily_entries.items()},
+                month_file)
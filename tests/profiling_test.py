@@ -0,0 +1,92 @@
+"""Test cases for the rn2md.profiling module."""
+import json
+import os
+import unittest
+
+from pyfakefs import fake_filesystem_unittest
+import yaml
+
+from rn2md import formatters, profiling, storage
+
+
+class ProfilingTest(fake_filesystem_unittest.TestCase):
+    """Test cases for recording stats of formatter stages and storage."""
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        profiling.enable()
+        self.addCleanup(profiling.disable)
+
+    def test_formatter_steps_are_recorded(self):
+        """Tests that every step is recorded, and output is unchanged."""
+        entry = '+ //A// ``b``\n+ c_d'
+        self.assertEqual(
+            formatters.format_entry(entry), '1. _A_ `b`\n2. c\\_d')
+
+        stats = profiling.stats()
+        self.assertEqual(stats['format.scan'].calls, 2)
+        self.assertEqual(stats['format.scan'].bytes, len('+ //A// ``b``+ c_d'))
+        self.assertEqual(stats['format.code'].calls, 2)
+        self.assertEqual(stats['format.lists'].calls, 2)
+        self.assertNotIn('format.stages', stats)
+
+    def test_formatter_steps_record_changed_bytes(self):
+        """Tests that steps record the bytes of the markup they change."""
+        self.assertEqual(
+            formatters.format_entry('+ at #work x_y //it// ``z``'),
+            '1. at #work x\\_y _it_ `z`')
+
+        stats = profiling.stats()
+        self.assertEqual(stats['format.underscores'].bytes, len('\\'))
+        # Each of the two '``' loses a backtick.
+        self.assertEqual(stats['format.code'].bytes, 2)
+        self.assertEqual(stats['format.delims'].bytes, len('//') * 2)
+        self.assertEqual(stats['format.lists'].bytes, len('1.'))
+
+    def test_output_is_the_same_as_without_profiling(self):
+        """Tests that profiling formats lines with the same code."""
+        entry = 'see [""a] [t ""u""]\n+ //A// ``b``\n=c_d='
+        profiled_md_entry = formatters.format_entry(entry)
+        profiling.disable()
+
+        self.assertEqual(profiled_md_entry, formatters.format_entry(entry))
+        self.assertEqual(profiled_md_entry.splitlines()[0], 'see [""a] [t](u)')
+
+    def test_storage_is_recorded(self):
+        """Tests that loading and parsing month files is recorded."""
+        month_content = yaml.dump({1: {'text': 'data'}})
+        self.fs.create_file('/data/2018-03.txt', contents=month_content)
+        storage.load_rednotebook_entries('/data')
+
+        stats = profiling.stats()
+        self.assertEqual(stats['storage.scan'].calls, 1)
+        self.assertEqual(stats['storage.parse'].calls, 1)
+        self.assertEqual(stats['storage.load'].bytes, len(month_content))
+
+    def test_disabled_profiling_records_nothing(self):
+        """Tests that nothing is recorded once profiling is disabled."""
+        profiling.disable()
+        formatters.format_entry('//a//')
+
+        self.assertEqual(profiling.stats(), {})
+
+    def test_reports(self):
+        """Tests that the stats can be summarized or written as JSON."""
+        profiling.record('slow', 2.0, 10)
+        profiling.record('fast', 0.5)
+        profiling.record('slow', 1.0)
+
+        self.assertEqual(profiling.format_summary().splitlines()[1:], [
+            'slow                                 2    3.0000          10',
+            'fast                                 1    0.5000           0',
+        ])
+        os.makedirs('/out')
+        profiling.write_json('/out/stats.json')
+        with open('/out/stats.json', encoding='utf-8') as stats_file:
+            self.assertEqual(json.load(stats_file)['slow'], {
+                'calls': 2, 'seconds': 3.0, 'bytes': 10,
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()
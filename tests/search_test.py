@@ -0,0 +1,64 @@
+"""Test cases for the rn2md.search module."""
+import datetime as dt
+import unittest
+from unittest import mock
+
+from pyfakefs import fake_filesystem_unittest
+
+from rn2md import search, storage
+from tests import month_files
+
+
+class SearchIndexTest(
+        month_files.MonthFilesMixin, fake_filesystem_unittest.TestCase):
+    """Test cases for updating and querying a SearchIndex."""
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self.index = search.SearchIndex(':memory:')
+        self.addCleanup(self.index.close)
+        self._create_month_test_file('2018-03.txt', {
+            1: 'Lunch with Alice',
+            24: 'Called alice about the //project//',
+        })
+        self._create_month_test_file('2018-04.txt', {2: 'Project kickoff'})
+
+    def test_search(self):
+        """Tests that entries using every word of the query are found."""
+        self.assertEqual(self.index.update('/data'), 2)
+
+        self.assertEqual(self.index.search('ALICE'), [
+            dt.date(2018, 3, 1), dt.date(2018, 3, 24)])
+        self.assertEqual(self.index.search('project alice'), [
+            dt.date(2018, 3, 24)])
+        self.assertEqual(self.index.search('project'), [
+            dt.date(2018, 3, 24), dt.date(2018, 4, 2)])
+        self.assertEqual(self.index.search('proj'), [])
+        self.assertEqual(self.index.search('!'), [])
+
+    def test_only_changed_month_files_are_indexed_again(self):
+        """Tests that updates only parse new and modified month files."""
+        self.index.update('/data')
+        self._create_month_test_file('2018-03.txt', {5: 'Dinner with Bob'})
+        self._create_month_test_file('2018-05.txt', {1: 'Bob again'})
+        self.fs.remove('/data/2018-04.txt')
+
+        with mock.patch.object(
+                storage, 'load_month_entries',
+                wraps=storage.load_month_entries) as mock_load:
+            self.assertEqual(self.index.update('/data'), 3)
+            self.assertEqual(
+                sorted(call.args[1] for call in mock_load.call_args_list),
+                ['/data/2018-03.txt', '/data/2018-05.txt'])
+            mock_load.reset_mock()
+            self.assertEqual(self.index.update('/data'), 0)
+            mock_load.assert_not_called()
+
+        self.assertEqual(self.index.search('alice'), [])
+        self.assertEqual(self.index.search('project'), [])
+        self.assertEqual(self.index.search('bob'), [
+            dt.date(2018, 3, 5), dt.date(2018, 5, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""Test cases for the rn2md.serve module."""
+import asyncio
+import datetime as dt
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from rn2md import formatters, serve, storage
+from tests import month_files
+
+
+class MarkdownServerTest(
+        month_files.MonthFilesMixin, unittest.IsolatedAsyncioTestCase):
+    """Test cases for requesting entries from a MarkdownServer."""
+
+    async def _get(self, target):
+        reader, writer = await asyncio.open_connection(
+            *self.server.sockets[0].getsockname()[:2])
+        writer.write(f'GET {target} HTTP/1.0\r\nHost: x\r\n\r\n'.encode())
+        response = await reader.read()
+        writer.close()
+        await writer.wait_closed()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), body.decode('utf-8')
+
+    async def asyncSetUp(self):
+        self.data_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_path)
+        self._create_month_test_file('2018-03.txt', {
+            19: '//Monday//',
+            21: '+ Wednesday',
+            25: 'Sunday',
+        })
+        markdown_server = serve.MarkdownServer(self.data_path)
+        self.server = await asyncio.start_server(
+            markdown_server.handle_connection, serve.DEFAULT_HOST, 0)
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_date(self):
+        """Tests that a single day's entry can be requested."""
+        self.assertEqual(
+            await self._get('/date/2018-03-21'), (200, '1. Wednesday\n'))
+        self.assertEqual(await self._get('/date/2018-03-22'), (200, '\n'))
+
+    async def test_week(self):
+        """Tests that the entries of a week can be requested."""
+        expected_body = formatters.ENTRY_SEP.join(
+            ['_Monday_', '1. Wednesday', 'Sunday']) + '\n'
+        self.assertEqual(
+            await self._get('/week/2018-03-21'), (200, expected_body))
+        self.assertEqual(
+            await self._get('/week/week%20of%20Mar%2021,%202018'),
+            (200, expected_body))
+
+    async def test_range(self):
+        """Tests that the entries between two dates can be requested."""
+        self.assertEqual(
+            await self._get('/range?start=2018-03-20&end=2018-03-25'),
+            (200, '1. Wednesday' + formatters.ENTRY_SEP + 'Sunday\n'))
+        self.assertEqual(
+            await self._get('/range?start=2000-01-01&end=2099-12-31'),
+            (200, formatters.ENTRY_SEP.join(
+                ['_Monday_', '1. Wednesday', 'Sunday']) + '\n'))
+
+    async def test_bad_requests(self):
+        """Tests that malformed and unknown requests are answered."""
+        self.assertEqual((await self._get('/date/March'))[0], 400)
+        self.assertEqual((await self._get('/range?start=today'))[0], 400)
+        self.assertEqual((await self._get('/unknown/2018-03-21'))[0], 404)
+
+    async def test_errors_are_answered(self):
+        """Tests that requests failing unexpectedly are still answered."""
+        with self.assertLogs('rn2md.serve', 'ERROR'), mock.patch.object(
+                serve.MarkdownCache, 'get_entries', side_effect=OSError):
+            self.assertEqual(await self._get('/date/2018-03-21'), (500, ''))
+
+    async def test_repeated_requests_are_cached(self):
+        """Tests that entries are only loaded again after they are saved."""
+        await self._get('/date/2018-03-21')
+        with mock.patch.object(
+                storage, 'load_month_entries',
+                wraps=storage.load_month_entries) as mock_load:
+            await self._get('/date/2018-03-21')
+            mock_load.assert_not_called()
+
+            month_path = os.path.join(self.data_path, '2018-03.txt')
+            self._create_month_test_file('2018-03.txt', {21: 'Changed'})
+            month_stat = os.stat(month_path)
+            os.utime(month_path, ns=(month_stat.st_atime_ns,
+                                     month_stat.st_mtime_ns + 1))
+            self.assertEqual(
+                await self._get('/date/2018-03-21'), (200, 'Changed\n'))
+            mock_load.assert_called_once()
+
+
+class MarkdownCacheTest(unittest.TestCase):
+    """Test cases for the MarkdownCache size limit and changing files."""
+
+    def setUp(self):
+        self.data_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_path)
+        with open(os.path.join(self.data_path, '2018-03.txt'), 'w',
+                  encoding='utf-8') as month_file:
+            yaml.dump({1: {'text': 'a'}, 2: {'text': 'b'}}, month_file)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Tests that the cache keeps only the most recent entries."""
+        cache = serve.MarkdownCache(self.data_path, max_entries=1)
+
+        self.assertEqual(cache.get_entries(
+            dt.date(2018, 3, 1), dt.date(2018, 3, 2)), ['a', 'b'])
+        with mock.patch.object(
+                storage, 'load_month_entries',
+                wraps=storage.load_month_entries) as mock_load:
+            self.assertEqual(cache.get_entries(
+                dt.date(2018, 3, 2), dt.date(2018, 3, 2)), ['b'])
+            mock_load.assert_not_called()
+            self.assertEqual(cache.get_entries(
+                dt.date(2018, 3, 1), dt.date(2018, 3, 1)), ['a'])
+            mock_load.assert_called_once()
+
+    def test_vanished_month_files_are_skipped(self):
+        """Tests that files deleted or changed while loading are skipped."""
+        cache = serve.MarkdownCache(self.data_path, max_entries=1)
+        month_files = [
+            (dt.date(2018, 2, 1), os.path.join(self.data_path, '2018-02.txt')),
+            *storage.find_month_files(self.data_path),
+        ]
+        with mock.patch.object(
+                storage, 'find_month_files', return_value=month_files):
+            self.assertEqual(cache.get_entries(
+                dt.date(2018, 2, 1), dt.date(2018, 3, 2)), ['a', 'b'])
+        # The entry of Mar 1 was evicted, and is gone once loaded again.
+        with mock.patch.object(storage, 'load_month_entries', return_value={}):
+            self.assertEqual(cache.get_entries(
+                dt.date(2018, 3, 1), dt.date(2018, 3, 2)), ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
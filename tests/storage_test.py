@@ -1,24 +1,21 @@
 """Test cases for the rn2md.storage module."""
 import datetime as dt
 import os
+import tempfile
 import unittest
+from unittest import mock
 
 from pyfakefs import fake_filesystem_unittest
 import yaml
 
 from rn2md import storage
+from tests import month_files
 
 
-class LoadDailyEntriesTest(fake_filesystem_unittest.TestCase):
+class LoadDailyEntriesTest(
+        month_files.MonthFilesMixin, fake_filesystem_unittest.TestCase):
     """Test case for the load_rednotebook_entries function."""
 
-    def _create_month_test_file(self, month_filename, daily_entries):
-        month_file_path = os.path.join('/data', month_filename)
-        month_file_content = yaml.dump(
-            {day: {'text': entry} for day, entry in daily_entries.items()})
-        self.fs.create_file(
-            month_file_path, contents=month_file_content, encoding='utf-8')
-
     def setUp(self):
         self.setUpPyfakefs()
 
@@ -44,6 +41,47 @@ class LoadDailyEntriesTest(fake_filesystem_unittest.TestCase):
             dt.date(2018, 1, 17): 'from valid file',
         })
 
+    def test_month_filenames(self):
+        """Tests which names are taken for month files."""
+        for filename in ('2018-01.txt', '2018-2.txt', '2018-03', '2018-13.txt',
+                         '2018-04.txt.bak', '0000-05.txt', 'x2018-06.txt'):
+            self._create_month_test_file(filename, {1: filename})
+        self.fs.create_dir('/data/2018-07.txt')
+
+        self.assertEqual(storage.find_month_files('/data'), [
+            (dt.date(2018, 1, 1), '/data/2018-01.txt'),
+            (dt.date(2018, 2, 1), '/data/2018-2.txt'),
+            (dt.date(2018, 3, 1), '/data/2018-03'),
+        ])
+
+    def test_files_of_the_same_month_are_merged(self):
+        """Tests that a month's entries may be split across several files."""
+        self._create_month_test_file('2018-03.txt', {1: 'a', 2: 'b'})
+        self._create_month_test_file('2018-03.txt~', {2: 'c', 3: 'd'})
+        self._create_month_test_file('2018-04.txt', {1: 'e'})
+
+        for date_range in (None, [dt.date(2018, 3, 3)]):
+            with self.subTest(date_range=date_range):
+                months = list(storage.iter_month_entries('/data', date_range))
+                self.assertEqual(
+                    storage.CompactEntries.from_months(months),
+                    storage.load_rednotebook_entries('/data', date_range))
+        self.assertEqual(list(storage.CompactEntries.from_months(
+            storage.iter_month_entries('/data'))), [
+                dt.date(2018, 3, 1), dt.date(2018, 3, 2), dt.date(2018, 3, 3),
+                dt.date(2018, 4, 1)])
+
+    def test_months_are_loaded_in_order(self):
+        """Tests that the order of the directory listing does not matter."""
+        for month in range(12, 0, -1):
+            self._create_month_test_file(f'2018-{month:02}.txt', {
+                day: f'{month}/{day}' for day in (20, 10)
+            })
+
+        entries = storage.load_rednotebook_entries('/data')
+        self.assertEqual(list(entries), sorted(entries))
+        self.assertEqual(len(entries), 24)
+
     def test_empty_entries_are_ignored(self):
         """Tests that only entries with data are part of the result."""
         self._create_month_test_file('2018-03.txt', {12: '', 24: 'non-empty'})
@@ -59,6 +97,345 @@ class LoadDailyEntriesTest(fake_filesystem_unittest.TestCase):
 
         self.assertFalse(storage.load_rednotebook_entries('/data'))
 
+    def test_date_range_limits_months_loaded(self):
+        """Tests that only month files overlapping the date range are read."""
+        self._create_month_test_file('2018-02.txt', {28: 'february'})
+        self._create_month_test_file('2018-03.txt', {1: 'march', 24: 'info'})
+        self._create_month_test_file('2019-03.txt', {1: 'next year'})
+
+        date_range = [dt.date(2018, 3, 1), dt.date(2018, 3, 2)]
+        with mock.patch.object(
+                storage, 'load_month_entries',
+                wraps=storage.load_month_entries) as mock_load:
+            self.assertEqual(
+                storage.load_rednotebook_entries('/data', date_range), {
+                    dt.date(2018, 3, 1): 'march',
+                })
+        mock_load.assert_called_once()
+
+    def test_date_range_with_cache(self):
+        """Tests that cached months are limited to the date range as well."""
+        self._create_month_test_file('2018-03.txt', {1: 'march', 24: 'info'})
+        date_range = [dt.date(2018, 3, 24)]
+
+        with storage.EntryCache(':memory:') as cache:
+            for _ in range(2):
+                self.assertEqual(
+                    storage.load_rednotebook_entries(
+                        '/data', date_range, cache),
+                    {dt.date(2018, 3, 24): 'info'})
+            self.assertEqual(
+                storage.load_rednotebook_entries('/data', cache=cache), {
+                    dt.date(2018, 3, 1): 'march',
+                    dt.date(2018, 3, 24): 'info',
+                })
+
+    def test_empty_date_range_loads_nothing(self):
+        """Tests that an empty date range does not parse any month files."""
+        self._create_month_test_file('2018-03.txt', {1: 'march'})
+
+        self.assertEqual(storage.load_rednotebook_entries('/data', []), {})
+
+    def test_tags(self):
+        """Tests that the dates of every tag are collected while loading."""
+        self._create_month_test_file('2018-04.txt', {2: '#Work and #home'})
+        self._create_month_test_file('2018-03.txt', {
+            1: 'some #work, a url http://x/#anchor, #123 and &#39;',
+            24: 'no tags',
+        })
+
+        tags = {}
+        storage.load_rednotebook_entries('/data', tags=tags)
+        self.assertEqual(tags, {
+            'work': [dt.date(2018, 3, 1), dt.date(2018, 4, 2)],
+            'home': [dt.date(2018, 4, 2)],
+        })
+
+    def test_python_yaml_backend_gives_same_results(self):
+        """Tests that the pure-Python fallback parses identical entries."""
+        self._create_month_test_file('2018-03.txt', {1: 'data', 24: '🎂'})
+        entries = storage.load_rednotebook_entries('/data')
+
+        with mock.patch.object(storage, '_YAML_LOADER', yaml.SafeLoader):
+            self.assertEqual(
+                storage.load_rednotebook_entries('/data'), entries)
+
+
+class IterDailyEntriesTest(unittest.TestCase):
+    """Test case for streaming the entries of a month file."""
+
+    MONTH_FILE = """
+1:
+  Cat: {Work: null, Ideas: [a, {b: c}]}
+  text: "first\\n"
+2: {text: '', extra: [1, 2]}
+3:
+  text: |
+    multi
+    line
+4: not a day
+note: skipped
+"""
+
+    def test_entries_are_read_in_order(self):
+        """Tests that only the text of non-empty days is yielded."""
+        self.assertEqual(
+            list(storage.iter_daily_entries(
+                dt.date(2018, 3, 1), self.MONTH_FILE)), [
+                    (dt.date(2018, 3, 1), 'first'),
+                    (dt.date(2018, 3, 3), 'multi\nline'),
+                ])
+
+    def test_dates_filter_days(self):
+        """Tests that days outside of the dates are skipped."""
+        self.assertEqual(
+            list(storage.iter_daily_entries(
+                dt.date(2018, 3, 1), self.MONTH_FILE,
+                dates={dt.date(2018, 3, 3)})),
+            [(dt.date(2018, 3, 3), 'multi\nline')])
+
+    def test_same_entries_as_loading_the_document(self):
+        """Tests that streaming agrees with loading the whole document."""
+        month_file = yaml.dump({
+            day: {'text': f'day {day} ' * day, 'Cat': {'x': day}}
+            for day in range(1, 29)
+        })
+        self.assertEqual(
+            dict(storage.iter_daily_entries(dt.date(2018, 2, 1), month_file)),
+            {
+                dt.date(2018, 2, day): content['text'].rstrip()
+                for day, content in yaml.safe_load(month_file).items()
+            })
+
+
+class LoadEntriesByDayTest(unittest.TestCase):
+    """Test case for loading single days through the day offset index."""
+
+    def setUp(self):
+        # A real directory, as the month files are memory-mapped.
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.month_path = os.path.join(temp_dir.name, '2018-03.txt')
+        self.month_date = dt.date(2018, 3, 1)
+
+    def _write_month_file(self, month_file_content):
+        with open(self.month_path, 'w', encoding='utf-8') as month_file:
+            month_file.write(month_file_content)
+
+    def _load_days(self, *days):
+        return storage.load_month_entries(
+            self.month_date, self.month_path,
+            dates={self.month_date.replace(day=day) for day in days})
+
+    def test_only_requested_days_are_parsed(self):
+        """Tests that a day is loaded without parsing the whole file."""
+        self._write_month_file(yaml.dump({
+            day: {'text': f'entry {day}\n\n- item #tag'}
+            for day in range(1, 29)
+        }))
+        with mock.patch.object(storage, '_load_daily_entries') as mock_load:
+            self.assertEqual(self._load_days(24), {
+                dt.date(2018, 3, 24): 'entry 24\n\n- item #tag',
+            })
+        mock_load.assert_not_called()
+
+    def test_same_entries_as_parsing_the_whole_file(self):
+        """Tests unusual but valid month files, such as flow mappings."""
+        month_file_contents = [
+            '# comment\n1: {text: one}\n2:\n  text: |-\n    two\n\n    x\n',
+            '{1: {text: one}, 2: {text: two}}\n',
+            '1:\n  text: "one\n2: {text: not a day}"\n3: {text: three}\n',
+            '1: {text: one}\n1: {text: again}\n',
+            '',
+        ]
+        for month_file_content in month_file_contents:
+            with self.subTest(month_file_content=month_file_content):
+                self._write_month_file(month_file_content)
+                for day in (1, 2, 3):
+                    date = self.month_date.replace(day=day)
+                    self.assertEqual(self._load_days(day), dict(
+                        storage.iter_daily_entries(
+                            self.month_date, month_file_content, {date})))
+
+    def test_rewritten_files_are_indexed_again(self):
+        """Tests that the offsets are not reused after the file changes."""
+        self._write_month_file(yaml.dump({1: {'text': 'old'}, 5: {}}))
+        self.assertEqual(self._load_days(1), {dt.date(2018, 3, 1): 'old'})
+
+        self._write_month_file(yaml.dump({
+            1: {'text': 'rewritten'}, 2: {'text': 'y'}, 5: {'text': 'z'},
+        }))
+        self.assertEqual(self._load_days(1), {
+            dt.date(2018, 3, 1): 'rewritten',
+        })
+
+
+class CompactEntriesTest(unittest.TestCase):
+    """Test case for the CompactEntries mapping."""
+
+    ENTRIES = {
+        dt.date(2018, 3, 24): 'info',
+        dt.date(1993, 1, 17): '🎂',
+        dt.date(2017, 12, 25): '🎅 and more',
+    }
+
+    def test_lookups(self):
+        """Tests that entries can be looked up by their date."""
+        entries = storage.CompactEntries(self.ENTRIES)
+
+        self.assertIn(dt.date(2017, 12, 25), entries)
+        self.assertNotIn(dt.date(2017, 12, 26), entries)
+        self.assertNotIn('2017-12-25', entries)
+        self.assertEqual(entries[dt.date(2017, 12, 25)], '🎅 and more')
+        with self.assertRaises(KeyError):
+            _ = entries[dt.date(2017, 12, 26)]
+
+    def test_iterates_in_date_order(self):
+        """Tests that the dates are iterated in order."""
+        self.assertEqual(list(storage.CompactEntries(self.ENTRIES)), [
+            dt.date(1993, 1, 17),
+            dt.date(2017, 12, 25),
+            dt.date(2018, 3, 24),
+        ])
+
+    def test_range(self):
+        """Tests that range only yields the entries between its bounds."""
+        entries = storage.CompactEntries(self.ENTRIES)
+
+        self.assertEqual(
+            list(entries.range(dt.date(2017, 1, 1), dt.date(2018, 3, 24))), [
+                (dt.date(2017, 12, 25), '🎅 and more'),
+                (dt.date(2018, 3, 24), 'info'),
+            ])
+        self.assertEqual(
+            list(entries.range(end=dt.date(2017, 12, 24))),
+            [(dt.date(1993, 1, 17), '🎂')])
+        self.assertEqual(
+            list(entries.range(start=dt.date(2018, 3, 25))), [])
+        self.assertEqual(len(list(entries.range())), 3)
+
+    def test_from_months(self):
+        """Tests that the store can be built one month at a time."""
+        entries = storage.CompactEntries.from_months([
+            {dt.date(1993, 1, 17): '🎂'},
+            {},
+            {
+                dt.date(2018, 3, 24): 'info',
+                dt.date(2017, 12, 25): '🎅 and more',
+            },
+        ])
+        self.assertEqual(entries, self.ENTRIES)
+        self.assertEqual(list(entries), sorted(self.ENTRIES))
+
+        with self.assertRaises(ValueError):
+            storage.CompactEntries.from_months([
+                {dt.date(2018, 3, 24): 'info'}, {dt.date(1993, 1, 17): '🎂'},
+            ])
+
+    def test_equals_source_dict(self):
+        """Tests that the mapping compares equal to the entries it holds."""
+        self.assertEqual(storage.CompactEntries(self.ENTRIES), self.ENTRIES)
+        self.assertEqual(len(storage.CompactEntries(self.ENTRIES)), 3)
+        self.assertEqual(storage.CompactEntries(), {})
+
+
+class EntryCacheTest(
+        month_files.MonthFilesMixin, fake_filesystem_unittest.TestCase):
+    """Test case for loading entries through an EntryCache."""
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self.cache = storage.EntryCache(':memory:')
+        self.addCleanup(self.cache.close)
+
+    def test_unchanged_files_are_not_parsed_again(self):
+        """Tests that a second load is served from the cache."""
+        self._create_month_test_file('2018-03.txt', {1: 'data', 24: '🎂'})
+        expected_entries = {
+            dt.date(2018, 3, 1): 'data',
+            dt.date(2018, 3, 24): '🎂',
+        }
+
+        self.assertEqual(
+            storage.load_rednotebook_entries('/data', cache=self.cache),
+            expected_entries)
+        with mock.patch.object(storage, '_load_daily_entries') as mock_load:
+            self.assertEqual(
+                storage.load_rednotebook_entries('/data', cache=self.cache),
+                expected_entries)
+        mock_load.assert_not_called()
+
+    def test_rewritten_files_are_parsed_again(self):
+        """Tests that changes to a month file invalidate its cached entries."""
+        self._create_month_test_file('2018-03.txt', {1: 'old'})
+        storage.load_rednotebook_entries('/data', cache=self.cache)
+
+        self.fs.remove('/data/2018-03.txt')
+        self._create_month_test_file('2018-03.txt', {1: 'new', 2: 'data'})
+
+        self.assertEqual(
+            storage.load_rednotebook_entries('/data', cache=self.cache), {
+                dt.date(2018, 3, 1): 'new',
+                dt.date(2018, 3, 2): 'data',
+            })
+
+    def test_hits_do_not_write(self):
+        """Tests that reading recently used entries leaves the cache as is."""
+        self._create_month_test_file('2018-03.txt', {1: 'data'})
+        storage.load_rednotebook_entries('/data', cache=self.cache)
+        num_changes = self.cache._db.total_changes
+
+        self.assertEqual(
+            storage.load_rednotebook_entries('/data', cache=self.cache),
+            {dt.date(2018, 3, 1): 'data'})
+        self.assertEqual(self.cache._db.total_changes, num_changes)
+
+    def test_database_errors_are_misses(self):
+        """Tests that entries are parsed when the database fails."""
+        self._create_month_test_file('2018-03.txt', {1: 'data'})
+        self.cache._db.close()
+
+        with self.assertLogs('rn2md.storage', 'WARNING'):
+            self.assertEqual(
+                storage.load_rednotebook_entries('/data', cache=self.cache),
+                {dt.date(2018, 3, 1): 'data'})
+
+    def test_least_recently_used_files_are_evicted(self):
+        """Tests that the cache drops the least-recently used month file."""
+        # Each month's entries take 15 bytes, so only two fit.
+        self.cache = storage.EntryCache(':memory:', max_size=40)
+        self.addCleanup(self.cache.close)
+        month_stats = {}
+        for month in range(1, 4):
+            month_path = f'/data/2018-{month:02}.txt'
+            self._create_month_test_file(month_path[6:], {1: 'x'})
+            month_stats[month_path] = os.stat(month_path)
+        entries = {dt.date(2018, 1, 1): 'x'}
+        interval = storage.EntryCache.TOUCH_INTERVAL_NS
+
+        with mock.patch.object(storage.time, 'time_ns') as mock_time_ns:
+            mock_time_ns.return_value = 0
+            self.cache.put(
+                '/data/2018-01.txt', month_stats['/data/2018-01.txt'], entries)
+            mock_time_ns.return_value = 1
+            self.cache.put(
+                '/data/2018-02.txt', month_stats['/data/2018-02.txt'], entries)
+            # January is used again, long enough after being stored to count.
+            mock_time_ns.return_value = 2 * interval
+            self.assertIsNotNone(self.cache.get(
+                '/data/2018-01.txt', month_stats['/data/2018-01.txt']))
+            mock_time_ns.return_value = 2 * interval + 1
+            self.cache.put(
+                '/data/2018-03.txt', month_stats['/data/2018-03.txt'], entries)
+
+        self.assertEqual({
+            month_path: self.cache.get(month_path, month_stat) is not None
+            for month_path, month_stat in month_stats.items()
+        }, {
+            '/data/2018-01.txt': True,
+            '/data/2018-02.txt': False,
+            '/data/2018-03.txt': True,
+        })
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 """Test cases for the rn2md.util module."""
 import unittest
+from unittest import mock
 
 import datetime as dt
 import freezegun
@@ -69,6 +70,21 @@ class ParseDatesTest(unittest.TestCase):
             util.strict_parse_date('Sun Mar 25, 2018'),
         ])
 
+    @freezegun.freeze_time(util.strict_parse_date('Mon Mar 26, 2018'))
+    def test_last_week_as_interval(self):
+        """Tests that the first and last day are returned for intervals."""
+        self.assertEqual(
+            util.parse_date_range('last week', as_interval=True), (
+                util.strict_parse_date('Mon Mar 19, 2018'),
+                util.strict_parse_date('Sun Mar 25, 2018'),
+            ))
+        self.assertEqual(
+            util.parse_date_range(
+                'last week', workdays_only=True, as_interval=True), (
+                    util.strict_parse_date('Mon Mar 19, 2018'),
+                    util.strict_parse_date('Fri Mar 23, 2018'),
+                ))
+
     @freezegun.freeze_time(util.strict_parse_date('Sat Mar 24, 2018'))
     def test_today_on_saturday_rounds_to_friday_in_workdays_only_mode(self):
         """Tests workday-mode rounds to friday on saturdays."""
@@ -128,5 +144,43 @@ class ParseDatesTest(unittest.TestCase):
             ])
 
 
+class ParseCommonDatesTest(unittest.TestCase):
+    """Tests for parsing common date forms without parsedatetime."""
+
+    COMMON_DATE_STRS = [
+        'today', 'Yesterday', 'tomorrow', 'this week', 'last  week',
+        'next week', 'week of today', 'week of 2018-03-21', '2018-03-21',
+        'Mar 1, 2018', 'wed Mar 21, 2018', 'week of Mar 21, 2018',
+    ]
+
+    @freezegun.freeze_time(util.strict_parse_date('Mon Dec 31, 2018'))
+    def test_same_dates_as_parsedatetime(self):
+        """Tests that the fast path agrees with parsedatetime."""
+        for date_str in self.COMMON_DATE_STRS:
+            with self.subTest(date_str=date_str):
+                with mock.patch.object(util, '_calendar') as mock_calendar:
+                    dates = util.parse_date_range(date_str)
+                mock_calendar.assert_not_called()
+                with mock.patch.object(
+                        util, '_parse_common_date', return_value=None):
+                    self.assertEqual(dates, util.parse_date_range(date_str))
+
+    def test_other_forms_use_parsedatetime(self):
+        """Tests that free-form dates fall back to parsedatetime."""
+        self.assertEqual(util.parse_date_range('March 21st 2018'),
+                         [dt.date(2018, 3, 21)])
+        self.assertEqual(util.parse_date_range('Thu Mar 21, 2018'),
+                         [dt.date(2018, 3, 21)])
+        with self.assertRaises(ValueError):
+            util.parse_date_range('no date here')
+
+    @freezegun.freeze_time(util.strict_parse_date('Mon Dec 31, 2018'))
+    def test_week_across_new_year(self):
+        """Tests that weeks belong to their ISO year, not the date's year."""
+        self.assertEqual(
+            util.parse_date_range('this week', as_interval=True),
+            (dt.date(2018, 12, 31), dt.date(2019, 1, 6)))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,65 @@
+"""Test cases for the rn2md.watch module."""
+import datetime as dt
+import unittest
+from unittest import mock
+
+from pyfakefs import fake_filesystem_unittest
+
+from rn2md import watch
+
+
+@mock.patch.object(watch, 'inotify_simple', None)
+class MonthFileWatcherTest(fake_filesystem_unittest.TestCase):
+    """Test case for polling a MonthFileWatcher."""
+
+    def setUp(self):
+        self.setUpPyfakefs()
+        self.fs.create_file('/data/2018-03.txt', contents='1: {text: old}')
+        self.fs.create_file('/data/2018-04.txt', contents='1: {text: old}')
+
+    def test_unchanged_files_are_not_reported(self):
+        """Tests that nothing is reported until month files change."""
+        with watch.MonthFileWatcher('/data') as watcher:
+            self.assertEqual(watcher.poll(), {})
+
+    def test_changes_are_reported(self):
+        """Tests that created, modified and deleted files are reported."""
+        with watch.MonthFileWatcher('/data') as watcher:
+            self.fs.create_file('/data/2018-05.txt', contents='1: {text: a}')
+            with open('/data/2018-03.txt', 'w', encoding='utf-8') as f:
+                f.write('1: {text: new data}')
+            self.fs.remove('/data/2018-04.txt')
+            self.fs.create_file('/data/notes.txt', contents='ignored')
+
+            self.assertEqual(watcher.poll(), {
+                dt.date(2018, 3, 1): '/data/2018-03.txt',
+                dt.date(2018, 4, 1): None,
+                dt.date(2018, 5, 1): '/data/2018-05.txt',
+            })
+            self.assertEqual(watcher.poll(), {})
+
+    def test_files_deleted_while_polling_are_reported(self):
+        """Tests that a file deleted after being listed counts as deleted."""
+        with watch.MonthFileWatcher('/data') as watcher:
+            find_month_files = watch.storage.find_month_files
+
+            def find_then_delete(data_path):
+                month_files = find_month_files(data_path)
+                self.fs.remove('/data/2018-04.txt')
+                return month_files
+
+            with mock.patch.object(watch.storage, 'find_month_files',
+                                   side_effect=find_then_delete):
+                self.assertEqual(watcher.poll(), {dt.date(2018, 4, 1): None})
+
+    def test_wait_returns_changes(self):
+        """Tests that wait polls until month files change."""
+        with watch.MonthFileWatcher('/data', poll_interval=0) as watcher:
+            with mock.patch.object(watcher, 'poll', side_effect=[
+                    {}, {dt.date(2018, 4, 1): None}]):
+                self.assertEqual(
+                    watcher.wait(), {dt.date(2018, 4, 1): None})
+
+
+if __name__ == '__main__':
+    unittest.main()